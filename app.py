@@ -38,6 +38,8 @@ def main():
             home.show()
 
         if st.sidebar.button("Logout"):
+            # Stop the session's agent request so it does not hold a slot after logout
+            home.cancel_llm_request()
             st.session_state['logged_in'] = False
             cookies.set('logged_in', False)  # Clear the login cookie
             time.sleep(1)  # Wait for 1 second before rerunning the app
@@ -0,0 +1,141 @@
+# batch_recommend.py
+# Prepares strategic recommendations ahead of time, e.g. for a quarter's client reviews.
+# Each client's portfolio is scored and turned into the same prompt the Recommendations
+# tab builds, sent to the agent with bounded concurrency, and the finished text is kept
+# in `recommendation_store`, where the tab finds it and shows it at once.
+#
+# The store doubles as the checkpoint: clients whose prompt already has a stored answer
+# are skipped, so an interrupted run continues where it stopped when started again.
+#
+# Usage:
+#   python batch_recommend.py book.csv --concurrency 8
+#   MAGNUS_LLM_BACKEND=stub python batch_recommend.py clients/*.xlsx
+#
+# Inputs are read like bulk_score.py: the columns of wealth_planning_form.xlsx plus a
+# client id column, with the rows of one client contiguous.
+import argparse
+import asyncio
+import sys
+import time
+
+import llm_agent
+from bulk_score import iter_client_chunks
+from utils.admission import llm_admission
+from utils.ingest import ingest_form
+from utils.llm_cache import recommendation_store, response_cache
+from utils.prompting import create_user_query, recommendation_messages
+from utils.scoring import calculate_wealth_score
+
+
+def iter_client_prompts(paths, chunksize, client_column):
+    """
+    Build the recommendation request of every client, exactly as the app does.
+
+    Yields:
+    - tuple: (client id, chat messages, number of cells that could not be converted).
+    """
+    for chunk in iter_client_chunks(paths, chunksize, client_column):
+        for client_id, rows in chunk.groupby(client_column, sort=False):
+            form, errors = ingest_form(rows.drop(columns=[client_column]))
+            results = calculate_wealth_score(form)
+            yield client_id, recommendation_messages(create_user_query(results, form)), len(errors)
+
+
+async def recommend(messages, semaphore):
+    """
+    Get the recommendation for one client and keep it in `recommendation_store`.
+
+    Returns:
+    - tuple: (status, error). Status is "stored", "reused" (a live answer was copied),
+      "skipped" (already stored) or "failed".
+    """
+    request = llm_agent.LLMStream(messages=messages)
+    key = (request.messages, llm_agent.cache_model(request.model), request.temperature)
+    if recommendation_store.get(*key) is not None:
+        return "skipped", None
+    cached = response_cache.get(*key)
+    if cached is not None:
+        recommendation_store.put(*key, cached)
+        return "reused", None
+
+    async with semaphore:
+        request.start()
+        await asyncio.wrap_future(request.future)
+    if not request.completed:
+        return "failed", request.error
+    recommendation_store.put(*key, request.text)
+    return "stored", None
+
+
+async def run_async(prompts, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"stored": 0, "reused": 0, "skipped": 0, "failed": 0}
+    pending = {}
+
+    def collect(done):
+        for task in done:
+            client_id, invalid_cells = pending.pop(task)
+            status, error = task.result()
+            counts[status] += 1
+            note = f" ({invalid_cells} invalid cells)" if invalid_cells else ""
+            note += f": {error}" if error else ""
+            print(f"[{sum(counts.values())}] {client_id}: {status}{note}", file=sys.stderr, flush=True)
+
+    # Prompts are built as slots free up, so memory stays flat for any number of clients
+    for client_id, messages, invalid_cells in prompts:
+        pending[asyncio.create_task(recommend(messages, semaphore))] = (client_id, invalid_cells)
+        if len(pending) >= 2 * concurrency:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        collect(done)
+    return counts
+
+
+def run(paths, concurrency=4, chunksize=50_000, client_column="Client ID"):
+    """
+    Prepare and store the recommendation of every client in `paths`.
+
+    Args:
+    - paths (list): Input files, read in order.
+    - concurrency (int, optional): Agent requests in flight at once.
+    - chunksize (int, optional): Approximate number of rows read at a time.
+    - client_column (str, optional): Column identifying the client of each row.
+
+    Returns:
+    - dict: Clients per status, the elapsed seconds and the clients finished per minute.
+    """
+    # This process is the only user of the agent, so the process-wide cap follows the batch
+    llm_admission.max_concurrent = concurrency
+    started = time.perf_counter()
+    counts = asyncio.run(run_async(iter_client_prompts(paths, chunksize, client_column), concurrency))
+    seconds = time.perf_counter() - started
+    finished = counts["stored"] + counts["reused"]
+    return {**counts, "seconds": seconds, "clients_per_minute": finished * 60 / seconds if seconds > 0 else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare strategic recommendations for many clients ahead of time.")
+    parser.add_argument("inputs", nargs="+", help="CSV, Parquet or wealth_planning_form.xlsx style files")
+    parser.add_argument("--concurrency", type=int, default=4, help="Agent requests in flight (default: 4)")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows read at a time (default: 50000)")
+    parser.add_argument("--client-column", default="Client ID", help="Client id column (default: 'Client ID')")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run(args.inputs, args.concurrency, args.chunksize, args.client_column)
+    except KeyboardInterrupt:
+        print("Interrupted; finished recommendations are stored, run again to continue", file=sys.stderr)
+        sys.exit(130)
+    print(
+        f"Stored {summary['stored']}, reused {summary['reused']}, skipped {summary['skipped']}, failed {summary['failed']} "
+        f"in {summary['seconds']:.1f} s ({summary['clients_per_minute']:.1f} clients/min) into {recommendation_store.path}",
+        file=sys.stderr,
+    )
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
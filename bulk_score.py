@@ -0,0 +1,215 @@
+# bulk_score.py
+# Headless bulk scorer for advisor books. Only imports the scoring core, so it runs
+# without Streamlit, AgGrid, Plotly or the LLM agent.
+#
+# Usage:
+#   python bulk_score.py book.csv -o scores.csv
+#   python bulk_score.py book.parquet clients/*.xlsx -o scores.parquet --workers 8 --options
+#
+# Inputs use the columns of wealth_planning_form.xlsx plus a client id column. Rows of
+# one client must be contiguous. Files (or workbook sheets) without a client id column
+# are scored as a single client named after the file (or "<file>/<sheet>").
+#
+# Cells that cannot be converted are scored as 0 or missing, like in the app, and listed
+# in "<output>_errors.csv" with their client, row, column and value.
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.ingest import ingest_form
+from utils.scoring import calculate_wealth_scores_batch, batch_scores_to_frame
+
+
+def read_csv_chunks(path, chunksize):
+    yield from pd.read_csv(path, chunksize=chunksize, keep_default_na=False)
+
+
+def read_parquet_chunks(path, chunksize):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def read_excel_chunks(path, chunksize):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            chunk = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                chunk.append(row)
+                if len(chunk) >= chunksize:
+                    yield _sheet_frame(chunk, header, path, sheet, len(workbook.worksheets))
+                    chunk = []
+            if chunk:
+                yield _sheet_frame(chunk, header, path, sheet, len(workbook.worksheets))
+    finally:
+        workbook.close()
+
+
+def _sheet_frame(rows, header, path, sheet, n_sheets):
+    frame = pd.DataFrame(rows, columns=header)
+    # A single-sheet form is named after the file, sheets of a workbook after "<file>/<sheet>"
+    frame.attrs["source"] = _stem(path) if n_sheets == 1 else f"{_stem(path)}/{sheet.title}"
+    return frame
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+readers = {
+    ".csv": read_csv_chunks,
+    ".parquet": read_parquet_chunks,
+    ".xlsx": read_excel_chunks,
+}
+
+
+def iter_client_chunks(paths, chunksize, client_column):
+    """
+    Stream input files as chunks that never split a client across two chunks.
+
+    Args:
+    - paths (list): Input files, read in order.
+    - chunksize (int): Approximate number of rows per chunk.
+    - client_column (str): Column identifying the client of each row.
+
+    Yields:
+    - pd.DataFrame: Rows of whole clients, with `client_column` filled in.
+    """
+    for path in paths:
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in readers:
+            raise ValueError(f"Unsupported input file: {path}")
+
+        carry = None
+        for chunk in readers[extension](path, chunksize):
+            if client_column not in chunk.columns:
+                chunk[client_column] = chunk.attrs.get("source", _stem(path))
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+
+            # Hold back the last client, its rows may continue in the next chunk
+            last_client = chunk[client_column].iloc[-1]
+            tail = chunk[client_column].eq(last_client).to_numpy()
+            tail_start = len(tail) - tail[::-1].argmin() if not tail.all() else 0
+            carry = chunk.iloc[tail_start:]
+            if tail_start:
+                yield chunk.iloc[:tail_start]
+        if carry is not None and len(carry):
+            yield carry
+
+
+def score_chunk(chunk, client_column, include_options):
+    # Runs in a worker process; the chunk is typed like the app's form before scoring
+    clients = chunk[client_column].to_numpy()
+    form, errors = ingest_form(chunk)
+    scores = calculate_wealth_scores_batch(form.assign(**{client_column: clients}), client_column=client_column)
+    # Errors name the client and the row within the client
+    rows = errors["Row"].to_numpy(dtype=int)
+    errors.insert(0, client_column, clients[rows])
+    errors["Row"] = chunk.groupby(client_column, sort=False).cumcount().to_numpy()[rows]
+    return batch_scores_to_frame(scores, include_options=include_options), errors
+
+
+class ScoreWriter:
+    # Appends score frames to a CSV or Parquet file as they arrive
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith(".parquet")
+        self.writer = None
+        self.rows = 0
+
+    def write(self, frame):
+        frame = frame.rename(columns=str)
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame.astype({"Client ID": str}), preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def run(paths, output, chunksize=50_000, workers=None, client_column="Client ID", include_options=False):
+    """
+    Score every client in `paths` and write one row per client to `output`.
+
+    Chunks are fanned out to a process pool. At most two chunks per worker are in
+    flight and results are written in input order as soon as they are ready, so
+    memory stays flat regardless of input size. Cells that could not be converted are
+    written to "<output>_errors.csv", which is only created when there are any; the
+    file of an earlier run is removed first, so it never describes another input.
+
+    Returns:
+    - tuple: (clients scored, invalid cells).
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = ScoreWriter(output)
+    error_writer = ScoreWriter(errors_path(output))
+    if os.path.exists(error_writer.path):
+        os.remove(error_writer.path)
+    pending = deque()
+
+    def write(future):
+        scores, errors = future.result()
+        writer.write(scores)
+        if len(errors):
+            error_writer.write(errors)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in iter_client_chunks(paths, chunksize, client_column):
+                pending.append(pool.submit(score_chunk, chunk, client_column, include_options))
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft())
+            while pending:
+                write(pending.popleft())
+    finally:
+        writer.close()
+    return writer.rows, error_writer.rows
+
+
+def errors_path(output):
+    return f"{os.path.splitext(output)[0]}_errors.csv"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score 4D Wealth portfolios in bulk.")
+    parser.add_argument("inputs", nargs="+", help="CSV, Parquet or wealth_planning_form.xlsx style files")
+    parser.add_argument("-o", "--output", required=True, help="Output .csv or .parquet file")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk (default: 50000)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--client-column", default="Client ID", help="Client id column (default: 'Client ID')")
+    parser.add_argument("--options", action="store_true", help="Also write per-option sums and scores")
+    args = parser.parse_args(argv)
+
+    clients, invalid_cells = run(args.inputs, args.output, args.chunksize, args.workers, args.client_column, args.options)
+    print(f"Scored {clients} clients into {args.output}", file=sys.stderr)
+    if invalid_cells:
+        print(f"{invalid_cells} cells could not be converted, see {errors_path(args.output)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import streamlit as st
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
 import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+from plotly.subplots import SubplotDomain
+from plotly.utils import PlotlyJSONEncoder
 import matplotlib.pyplot as plt
 import plotly.express as px
 import seaborn as sns
@@ -9,6 +13,12 @@ import streamlit.components.v1 as components
 import llm_agent
 import asyncio
 import json
+from utils.scoring import dimensions, option_scores, calculate_wealth_score, IncrementalScorer, scoring_config
+from utils.attribution import asset_attribution, top_moves
+from utils.optimizer import optimize_allocation
+from utils.ingest import ingest_form, ingest_cell
+from utils.cache import portfolio_key, result_cache, memoize_builder
+from utils.prompting import create_user_query, prompt_stats, recommendation_messages, follow_up_messages
 
 
 # # Disable default sidebar navigation
@@ -80,110 +90,6 @@ Each strategy focuses on different dimensions to maximize your wealth score:
 
 By reallocating your assets according to these strategies, you can significantly improve your overall wealth score."""
 
-# Define the dimensions and their options with weights
-dimensions = {
-    "D1": {"label": "Taxation on Funding", "options": ["Pre-Tax", "Partially Pre-Tax", "After-Tax"], "weight": 0.20},
-    "D2": {"label": "Taxation on Growth", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Tax-Deferred", "Tax-Free"], "weight": 0.20},
-    "D3": {"label": "Taxation on Distribution", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Not taxable"], "weight": 0.20},
-    "D4": {"label": "Taxation on Death", "options": ["Yes", "No"], "weight": 0.20},
-    "D5": {"label": "Asset Protection", "options": ["Yes", "No", "Partially"], "weight": 0.10},
-    "D6": {"label": "Charitable Deduction", "options": ["Yes", "No"], "weight": 0.10}
-}
-
-# Define scores for options in each dimension
-option_scores = {
-    "D1": {"Pre-Tax": 3, "Partially Pre-Tax": 2, "After-Tax": 1},
-    "D2": {"Taxable/Capital Gain": 1, "Taxable/Ordinary Income": 2, "Tax-Deferred": 3, "Tax-Free": 4},
-    "D3": {"Taxable/Ordinary Income": 1, "Taxable/Capital Gain": 2, "Not taxable": 3},
-    "D4": {"Yes": 1, "No": 2},
-    "D5": {"Yes": 3, "Partially": 2, "No": 1},
-    "D6": {"Yes": 2, "No": 1}
-    }
-
-def calculate_wealth_score(form_data):
-    global dimensions
-    global option_scores
-    # Compute total income before and after planning
-    total_income_before_planning = form_data["Before Planning"].replace('', 0).astype(float).sum()
-    total_income_after_planning = form_data["After Planning"].replace('', 0).astype(float).sum()
-
-    results = {}
-
-    # Initialize accumulators for overall scores
-    overall_total_before_score = 0
-    overall_total_after_score = 0
-
-    for dimension, props in dimensions.items():
-        dimension_label = props["label"]
-        options = props["options"]
-        weight = props["weight"]
-
-        # Initialize results for this dimension
-        results[dimension] = {
-            "Dimension Label": dimension_label,
-            "Options": {}
-        }
-
-        total_before_score = 0
-        total_after_score = 0
-
-        for option in options:
-            before_sum = form_data[form_data[f"{dimension}: {dimension_label}"] == option]["Before Planning"].replace('', 0).astype(float).sum()
-            after_sum = form_data[form_data[f"{dimension}: {dimension_label}"] == option]["After Planning"].replace('', 0).astype(float).sum()
-
-            # Get the score for this option
-            option_score = option_scores[dimension].get(option, 0)
-
-            # Calculate the percentage for the option in the dimension
-            before_percentage = before_sum / total_income_before_planning if total_income_before_planning != 0 else 0
-            after_percentage = after_sum / total_income_after_planning if total_income_after_planning != 0 else 0
-
-            # Calculate scores before and after planning
-            # Note: Special case for D6 where Before Planning Score is set to zero for all options
-            if dimension == "D6":
-                score_before_planning = 0
-            else:
-                score_before_planning = (weight * 100 * option_score / len(options)) * before_percentage
-
-            score_after_planning = (weight * 100 * option_score / len(options)) * after_percentage
-
-            # Accumulate scores for the dimension
-            total_before_score += score_before_planning
-            total_after_score += score_after_planning
-
-            # Populate the nested dictionary for each option
-            results[dimension]["Options"][option] = {
-                "Before Planning": float(before_sum),
-                "After Planning": float(after_sum),
-                "Before Planning %": float(round(before_percentage, 4)),  # Format as percentage
-                "After Planning %": float(round(after_percentage, 4)),   # Format as percentage
-                "Before Planning Score": float(round(score_before_planning, 2)),
-                "After Planning Score": float(round(score_after_planning, 2))
-            }
-
-        # Add the total scores for the dimension
-        results[dimension]["Total Before Planning Score"] = float(round(total_before_score, 2))
-        results[dimension]["Total After Planning Score"] = float(round(total_after_score, 2))
-
-        # Add the total scores for the dimension
-        results[dimension]["Total Before Planning Score Percentage"] = float(round(total_before_score/weight, 4))
-        results[dimension]["Total After Planning Score Percentage"] = float(round(total_after_score/weight, 4))
-
-        # Calculate the weighted average score for the dimension
-        overall_total_before_score += total_before_score
-        overall_total_after_score += total_after_score
-
-    # Add the overall scores to the results dictionary
-    results["Overall"] = {
-        "Overall Before Planning Score": float(round(overall_total_before_score, 2)),
-        "Overall After Planning Score": float(round(overall_total_after_score, 2))
-    }
-
-    return results
-
-
-
-
 # Data for the gauge charts
 performance_data = {
     "Poor": 20,
@@ -191,6 +97,7 @@ performance_data = {
     "Good": 50
 }
 
+@memoize_builder
 def create_gauge_chart(score, title, reference):
     # Create a gauge chart
     fig = go.Figure(go.Indicator(
@@ -217,6 +124,7 @@ def create_gauge_chart(score, title, reference):
     return fig
 
 # Define function to get color mapping based on option scores
+@memoize_builder
 def get_color_map(option_scores):
     sorted_options = sorted(option_scores.items(), key=lambda x: x[1], reverse=True)  # Sort descending by score
     color_map = {}
@@ -230,6 +138,7 @@ def get_color_map(option_scores):
     return color_map
 
 # Define function to create a stacked bar chart
+@memoize_builder
 def create_stacked_bar_chart(dimension_data, dimension_label, option_scores):
     options = dimension_data['Options']
     color_map = get_color_map(option_scores)
@@ -305,6 +214,7 @@ def create_stacked_bar_chart(dimension_data, dimension_label, option_scores):
     return fig
 
 # Define function to create a pie chart
+@memoize_builder
 def create_pie_chart(data, option_scores, title):
     color_map = get_color_map(option_scores)
     labels = list(data.keys())
@@ -342,29 +252,216 @@ def create_pie_chart(data, option_scores, title):
     return fig
 
 
+# Decimals kept in the numbers of the combined figures; dollars to the cent, shares to 0.01%
+dollar_precision = 2
+share_precision = 4
+
+
+def figure_bytes(fig):
+    # Size of the spec `st.plotly_chart` sends to the browser
+    return len(pio.to_json(fig, validate=False))
+
+
+def dimension_items(results):
+    return [(dimension_key, dimension_data) for dimension_key, dimension_data in results.items() if dimension_key.startswith('D')]
+
+
+def grid_traces(fig):
+    # Traces of a figure as Plotly JSON, the form the per-dimension pieces are cached in
+    return json.dumps(fig.to_plotly_json()['data'], cls=PlotlyJSONEncoder)
+
+
+def grid_scaffold(fig, cells):
+    """
+    Layout of an empty subplot figure and the subplot reference of each cell, as JSON.
+
+    Args:
+    - fig (go.Figure): Figure from `make_subplots`, with its layout finished.
+    - cells (list): (row, col) pairs in the order the pieces are placed.
+
+    Returns:
+    - str: {"layout": ..., "cells": [...]}, each cell being the `domain` or the
+      `xaxis`/`yaxis` keys its traces need.
+    """
+    refs = []
+    for row, col in cells:
+        subplot = fig.get_subplot(row, col)
+        if isinstance(subplot, SubplotDomain):
+            refs.append({'domain': {'x': list(subplot.x), 'y': list(subplot.y)}})
+        else:
+            refs.append({'xaxis': subplot.xaxis.plotly_name.replace('axis', ''), 'yaxis': subplot.yaxis.plotly_name.replace('axis', '')})
+    return json.dumps({'layout': fig.to_plotly_json()['layout'], 'cells': refs}, cls=PlotlyJSONEncoder)
+
+
+def assemble_grid(scaffold, pieces):
+    """
+    Put cached traces into a cached scaffold.
+
+    Args:
+    - scaffold (str): JSON from `grid_scaffold`.
+    - pieces (list): One JSON list of traces per cell, in the scaffold's order.
+
+    Returns:
+    - go.Figure: The combined figure. Scaffold and traces were validated when they were
+      built, so the figure is assembled without validating them again.
+    """
+    scaffold = json.loads(scaffold)
+    data = [{**trace, **cell} for cell, piece in zip(scaffold['cells'], pieces) for trace in json.loads(piece)]
+    return go.Figure(data=data, layout=scaffold['layout'], _validate=False)
+
+
+@memoize_builder
+def pie_chart_traces(dimension_key, dimension_data, option_scores, stage):
+    """
+    The pie of one dimension at one planning stage, for `create_pie_chart_grid`.
+
+    Args:
+    - dimension_key (str): The dimension, e.g. "D1".
+    - dimension_data (dict): The dimension's entry in the results.
+    - option_scores (dict): The option scores of this dimension.
+    - stage (str): "Before Planning" or "After Planning".
+
+    Returns:
+    - str: The trace as Plotly JSON.
+    """
+    color_map = get_color_map(option_scores)
+    sorted_options = sorted(dimension_data['Options'], key=lambda x: option_scores[x], reverse=True)
+    return grid_traces(go.Figure(go.Pie(
+        labels=[f"{dimension_key}: {option}" for option in sorted_options],
+        values=[round(dimension_data['Options'][option][stage], dollar_precision) for option in sorted_options],
+        hole=0.3,
+        marker=dict(colors=[color_map[option] for option in sorted_options]),
+        textinfo='label+percent',
+        sort=False,
+    )))
+
+
+@memoize_builder
+def pie_grid_scaffold(labels):
+    # Rows of Before/After pies, one per dimension label
+    titles = [f"{label} - {stage}" for label in labels for stage in ("Before Planning", "After Planning")]
+    fig = make_subplots(rows=len(labels), cols=2, specs=[[{'type': 'domain'}] * 2] * len(labels), subplot_titles=titles)
+    fig.update_layout(
+        height=400 * len(labels),
+        legend=dict(title='Options', traceorder='normal', orientation='v'),
+        margin=dict(l=0, r=0, t=50, b=0),
+    )
+    return grid_scaffold(fig, [(row, col) for row in range(1, len(labels) + 1) for col in (1, 2)])
+
+
+def create_pie_chart_grid(results, option_scores):
+    """
+    All dimension distributions, before and after planning, as one subplot figure.
+
+    One figure carries one template and one legend instead of twelve. Slices are
+    labelled "<dimension>: <option>" because options such as "Yes" score differently
+    in different dimensions. The pies are memoized as JSON on their own dimension,
+    so an edit rebuilds only the dimensions it changed.
+
+    Args:
+    - results (dict): The results from `calculate_wealth_score`.
+    - option_scores (dict): The option scores of every dimension.
+
+    Returns:
+    - go.Figure: One row per dimension, Before Planning on the left and After Planning on the right.
+    """
+    items = dimension_items(results)
+    scaffold = pie_grid_scaffold(tuple(data['Dimension Label'] for _, data in items))
+    return assemble_grid(scaffold, [
+        pie_chart_traces(dimension_key, dimension_data, option_scores[dimension_key], stage)
+        for dimension_key, dimension_data in items
+        for stage in ("Before Planning", "After Planning")
+    ])
+
+
+@memoize_builder
+def stacked_bar_traces(dimension_key, dimension_data, option_scores):
+    """
+    The before/after stacked bars of one dimension, for `create_stacked_bar_grid`.
+
+    Args:
+    - dimension_key (str): The dimension, e.g. "D1"; it names the legend group.
+    - dimension_data (dict): The dimension's entry in the results.
+    - option_scores (dict): The option scores of this dimension.
+
+    Returns:
+    - str: One bar trace per option as Plotly JSON.
+    """
+    fig = go.Figure()
+    for option, color in get_color_map(option_scores).items():
+        if option not in dimension_data['Options']:
+            continue
+        values = dimension_data['Options'][option]
+        shares = [round(values['Before Planning %'], share_precision), round(values['After Planning %'], share_precision)]
+        fig.add_trace(go.Bar(
+            x=['Before Planning', 'After Planning'],
+            y=shares,
+            name=option,
+            marker_color=color,
+            text=[f'{share*100:.1f}%' for share in shares],
+            textposition='inside',
+            width=0.35,
+            legendgroup=dimension_key,
+            legendgrouptitle_text=dimension_data['Dimension Label'],
+        ))
+    return grid_traces(fig)
+
+
+@memoize_builder
+def stacked_bar_grid_scaffold(labels):
+    # Two panels per row, one per dimension label
+    rows = (len(labels) + 1) // 2
+    fig = make_subplots(rows=rows, cols=2, subplot_titles=list(labels), vertical_spacing=0.08)
+    fig.update_layout(
+        barmode='stack',
+        height=350 * rows,
+        legend=dict(title='Options', groupclick='toggleitem', tracegroupgap=10),
+        margin=dict(l=0, r=0, t=50, b=0),
+    )
+    fig.update_yaxes(range=[0, 1], tickformat='%')
+    return grid_scaffold(fig, [(position // 2 + 1, position % 2 + 1) for position in range(len(labels))])
+
+
+def create_stacked_bar_grid(results, option_scores):
+    """
+    The before/after stacked bars of every dimension as one subplot figure.
+
+    The bars are memoized as JSON on their own dimension.
+
+    Args:
+    - results (dict): The results from `calculate_wealth_score`.
+    - option_scores (dict): The option scores of every dimension.
+
+    Returns:
+    - go.Figure: One panel per dimension, with a legend grouped by dimension.
+    """
+    items = dimension_items(results)
+    scaffold = stacked_bar_grid_scaffold(tuple(data['Dimension Label'] for _, data in items))
+    return assemble_grid(scaffold, [
+        stacked_bar_traces(dimension_key, dimension_data, option_scores[dimension_key])
+        for dimension_key, dimension_data in items
+    ])
+
+
+
 
 import altair as alt
 import pandas as pd
 import streamlit as st
 
-def make_donut(input_response, input_text):
-    input_response = round(input_response, 1)  # Round to one decimal place
+def donut_colors(input_response):
+    # (arc, background) colors of a donut by score band
     if input_response<=20:
-        input_color = 'red'
+        return ['#E74C3C', '#781F16']
     elif input_response>20 and input_response<=60:
-        input_color = 'orange'
-    elif input_response>60:
-        input_color = 'green'
+        return ['#F39C12', '#875A12']
+    return ['#27AE60', '#12783D']
 
 
-    if input_color == 'blue':
-        chart_color = ['#29b5e8', '#155F7A']
-    if input_color == 'green':
-        chart_color = ['#27AE60', '#12783D']
-    if input_color == 'orange':
-        chart_color = ['#F39C12', '#875A12']
-    if input_color == 'red':
-        chart_color = ['#E74C3C', '#781F16']
+@memoize_builder
+def make_donut(input_response, input_text):
+    input_response = round(input_response, 1)  # Round to one decimal place
+    chart_color = donut_colors(input_response)
 
     source = pd.DataFrame({
         "Topic": ['', input_text],
@@ -397,7 +494,100 @@ def make_donut(input_response, input_text):
 
     return plot_bg + plot + text
 
-def display_wealth_score_results(results, df):
+@memoize_builder
+def donut_records(dimension_data):
+    """
+    The data rows of one dimension's Before and After donuts, for `make_donut_grid`.
+
+    Args:
+    - dimension_data (dict): The dimension's entry in the results.
+
+    Returns:
+    - str: The rows as a JSON list.
+    """
+    records = []
+    for stage, score_key in (("Before", "Total Before Planning Score Percentage"), ("After", "Total After Planning Score Percentage")):
+        value = round(dimension_data[score_key], 1)
+        arc_color, background_color = donut_colors(value)
+        base = {"Dimension": dimension_data['Dimension Label'], "Stage": stage, "Label": f"{value} %", "Text Color": background_color}
+        records.append({**base, "Topic": "Score", "% value": value, "Color": arc_color, "Order": 0})
+        records.append({**base, "Topic": "Remaining", "% value": 100 - value, "Color": background_color, "Order": 1})
+    return json.dumps(records)
+
+
+@memoize_builder
+def donut_grid_spec(dimension_order):
+    # The faceted donut spec without its data, as Vega-Lite JSON
+    base = alt.Chart().properties(width=220, height=220)
+    arc = dict(innerRadius=60, cornerRadius=25)
+    plot_bg = base.transform_filter(alt.datum.Topic == "Remaining").transform_calculate(Full="100").mark_arc(**arc).encode(
+        theta=alt.Theta("Full:Q"),
+        color=alt.Color("Color:N", scale=None),
+    )
+    plot = base.mark_arc(**arc).encode(
+        theta=alt.Theta(field="% value", type="quantitative"),
+        color=alt.Color("Color:N", scale=None),
+        order=alt.Order("Order:Q"),
+    )
+    text = base.transform_filter(alt.datum.Topic == "Score").mark_text(
+        align='center', font="Lato", fontSize=22, fontWeight=700, fontStyle="italic",
+    ).encode(text="Label:N", color=alt.Color("Text Color:N", scale=None))
+
+    return alt.layer(plot_bg, plot, text, data=alt.InlineData(values=[])).facet(
+        row=alt.Row("Dimension:N", sort=list(dimension_order), title=None),
+        column=alt.Column("Stage:N", sort=["Before", "After"], title=None),
+    ).to_json()
+
+
+def make_donut_grid(results):
+    """
+    Every dimension score donut, before and after planning, as one faceted chart.
+
+    All values travel in one dataset and one spec is faceted by dimension and stage,
+    instead of twelve specs with three layers and two inline datasets each. The rows
+    of each dimension are memoized as JSON on that dimension, the spec on the labels.
+
+    Args:
+    - results (dict): The results from `calculate_wealth_score`.
+
+    Returns:
+    - dict: The Vega-Lite spec with its data, for `st.vega_lite_chart`. One row per
+      dimension, Before and After in the two columns.
+    """
+    items = dimension_items(results)
+    spec = json.loads(donut_grid_spec(tuple(dimension_data['Dimension Label'] for _, dimension_data in items)))
+    # Altair names the (empty) dataset of the cached spec; fill it with the current rows
+    spec['datasets'][spec['data']['name']] = [record for _, dimension_data in items for record in json.loads(donut_records(dimension_data))]
+    return spec
+
+
+def chart_bytes(chart):
+    # Size of the Vega-Lite spec, data included, sent to the browser
+    return len(json.dumps(chart if isinstance(chart, dict) else chart.to_dict()))
+
+
+def create_asset_type_bar_chart(df, title):
+    # Grouped Before/After bars for one family of asset types
+    fig = px.bar(df, x='Asset Type', y=['Before Planning', 'After Planning'],
+                 title=title,
+                 labels={'value': 'Dollar Amount', 'variable': 'Planning Stage'},
+                 barmode='group')
+    fig.update_layout(xaxis_title="Asset Type", yaxis_title="Dollar Amount")
+    return fig
+
+
+def cached_result(cache_key, name, compute):
+    # Memoize anything derived from the portfolio in the shared result cache
+    if cache_key is None:
+        return compute()
+    return result_cache.get_or_compute((cache_key, name), compute)
+
+
+def cached_figure(cache_key, name, build):
+    return cached_result(cache_key, ("figure", name), build)
+
+
+def display_wealth_score_results(results, df, cache_key=None):
     global dimensions
     global option_scores
 
@@ -430,161 +620,281 @@ def display_wealth_score_results(results, df):
     else:
         st.write("Overall scores are not available for display.")
 
-    
-    
+
     st.divider()
     st.header("Wealth Score Analysis")
 
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Dimension Analysis", "Redistribution Analysis 1", "Redistribution Analysis 2", "Asset Type Analysis", "Recommendations"])
-
-
-    with tab1:
-        # Create pie charts for each dimension
-        st.header("Dimension Scores")
-        for dimension_key, dimension_data in results.items():
-            if dimension_key.startswith('D'):
-                st.divider()
-                st.subheader(f"Dimension Score - {dimension_data['Dimension Label']}")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write("Before Planning")
-                    donut_chart_before = make_donut(
-                        input_response=dimension_data["Total Before Planning Score Percentage"],
-                        input_text="Before",
-                    )
-                    st.altair_chart(donut_chart_before, use_container_width=True)
-                with col2:
-                    st.write("After Planning")
-                    donut_chart_after = make_donut(
-                        input_response=dimension_data["Total After Planning Score Percentage"],
-                        input_text="After",
-                    )
-                    st.altair_chart(donut_chart_after, use_container_width=True)
-
-    with tab2:
-        # Create pie charts for each dimension
-        st.header("Distribution of Wealth Percentage Across Dimensions")
-        for dimension_key, dimension_data in results.items():
-            if dimension_key.startswith('D'):
-                before_distribution = {option: values['Before Planning'] for option, values in dimension_data['Options'].items()}
-                after_distribution = {option: values['After Planning'] for option, values in dimension_data['Options'].items()}
-                st.divider()
-                st.subheader(f"Dimension Distribution - {dimension_data['Dimension Label']}")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write("Before Planning")
-                    pie_chart_before = create_pie_chart(before_distribution, option_scores[dimension_key], f"{dimension_data['Dimension Label']} - Before Planning")
-                    st.plotly_chart(pie_chart_before)
-                with col2:
-                    st.write("After Planning")
-                    pie_chart_after = create_pie_chart(after_distribution, option_scores[dimension_key], f"{dimension_data['Dimension Label']} - After Planning")
-                    st.plotly_chart(pie_chart_after)
-
-
-    with tab3:
-        # Display stacked bar charts for each dimension
-        st.header("Impact of Redistribution of Wealth")
-        for dimension_key, dimension_data in results.items():
-            if dimension_key.startswith('D'):
-                st.divider()
-                dimension_label = dimension_data['Dimension Label']
-                option_scores_for_dimension = option_scores[dimension_key]
-                chart = create_stacked_bar_chart(dimension_data, dimension_label, option_scores_for_dimension)
-                st.plotly_chart(chart)
+    # Only the selected section is built and sent; results and figures come from the
+    # shared cache, so switching back and forth does not rebuild anything
+    selected_tab = st.radio("Wealth Score Analysis", list(result_tabs), horizontal=True, key="results_tab", label_visibility="collapsed")
+    st.toggle("One combined chart per section", value=True, key="combined_charts",
+              help="Send each chart section as a single figure with one spec, template and legend; smaller payload on slow connections.")
+    result_tabs[selected_tab](results, df, cache_key)
+
+
+def show_dimension_tab(results, df, cache_key=None):
+    # Create pie charts for each dimension
+    st.header("Dimension Scores")
+    if st.session_state.get('combined_charts', True):
+        chart = make_donut_grid(results)
+        st.vega_lite_chart(chart)
+        st.caption(f"Chart payload: {chart_bytes(chart) / 1024:,.1f} KB in 1 chart")
+        return
+
+    charts = []
+    for dimension_key, dimension_data in results.items():
+        if dimension_key.startswith('D'):
+            st.divider()
+            st.subheader(f"Dimension Score - {dimension_data['Dimension Label']}")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("Before Planning")
+                donut_chart_before = make_donut(
+                    input_response=dimension_data["Total Before Planning Score Percentage"],
+                    input_text="Before",
+                )
+                st.altair_chart(donut_chart_before, use_container_width=True)
+            with col2:
+                st.write("After Planning")
+                donut_chart_after = make_donut(
+                    input_response=dimension_data["Total After Planning Score Percentage"],
+                    input_text="After",
+                )
+                st.altair_chart(donut_chart_after, use_container_width=True)
+            charts += [donut_chart_before, donut_chart_after]
+    st.caption(f"Chart payload: {sum(map(chart_bytes, charts)) / 1024:,.1f} KB in {len(charts)} charts")
+
+
+def show_distribution_tab(results, df, cache_key=None):
+    # Create pie charts for each dimension
+    st.header("Distribution of Wealth Percentage Across Dimensions")
+    if st.session_state.get('combined_charts', True):
+        fig = create_pie_chart_grid(results, option_scores)
+        st.plotly_chart(fig, use_container_width=True)
+        show_payload_size([fig])
+        return
+
+    figures = []
+    for dimension_key, dimension_data in results.items():
+        if dimension_key.startswith('D'):
+            before_distribution = {option: values['Before Planning'] for option, values in dimension_data['Options'].items()}
+            after_distribution = {option: values['After Planning'] for option, values in dimension_data['Options'].items()}
+            st.divider()
+            st.subheader(f"Dimension Distribution - {dimension_data['Dimension Label']}")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("Before Planning")
+                pie_chart_before = create_pie_chart(before_distribution, option_scores[dimension_key], f"{dimension_data['Dimension Label']} - Before Planning")
+                st.plotly_chart(pie_chart_before)
+            with col2:
+                st.write("After Planning")
+                pie_chart_after = create_pie_chart(after_distribution, option_scores[dimension_key], f"{dimension_data['Dimension Label']} - After Planning")
+                st.plotly_chart(pie_chart_after)
+            figures += [pie_chart_before, pie_chart_after]
+    show_payload_size(figures)
+
+
+def show_redistribution_tab(results, df, cache_key=None):
+    # Display stacked bar charts for each dimension
+    st.header("Impact of Redistribution of Wealth")
+    if st.session_state.get('combined_charts', True):
+        fig = create_stacked_bar_grid(results, option_scores)
+        st.plotly_chart(fig, use_container_width=True)
+        show_payload_size([fig])
+        return
+
+    figures = []
+    for dimension_key, dimension_data in results.items():
+        if dimension_key.startswith('D'):
+            st.divider()
+            dimension_label = dimension_data['Dimension Label']
+            option_scores_for_dimension = option_scores[dimension_key]
+            chart = create_stacked_bar_chart(dimension_data, dimension_label, option_scores_for_dimension)
+            st.plotly_chart(chart)
+            figures.append(chart)
+    show_payload_size(figures)
 
 
-    
-    with tab4:
-        st.header("Asset Type Analysis")
-
-        # Filter dataframes
-        df_qualified = df[df['Asset Type'].str.contains("Qualified") & ~df['Asset Type'].str.contains("Non-Qualified")]
-        df_non_qualified = df[df['Asset Type'].str.contains("Non-Qualified")]
-        df_others = df[~df['Asset Type'].str.contains("Qualified|Non-Qualified")]
-        
-        st.divider()
-        # Plot for Qualified
-        fig_qualified = px.bar(df_qualified, x='Asset Type', y=['Before Planning', 'After Planning'],
-                            title="Qualified Asset Types",
-                            labels={'value': 'Dollar Amount', 'variable': 'Planning Stage'},
-                            barmode='group')
-        fig_qualified.update_layout(xaxis_title="Asset Type", yaxis_title="Dollar Amount")
-        st.plotly_chart(fig_qualified)
-
-        st.divider()
-        # Plot for Non-Qualified
-        fig_non_qualified = px.bar(df_non_qualified, x='Asset Type', y=['Before Planning', 'After Planning'],
-                                title="Non-Qualified Asset Types",
-                                labels={'value': 'Dollar Amount', 'variable': 'Planning Stage'},
-                                barmode='group')
-        fig_non_qualified.update_layout(xaxis_title="Asset Type", yaxis_title="Dollar Amount")
-        st.plotly_chart(fig_non_qualified)
-
-        st.divider()
-        # Plot for Others
-        fig_others = px.bar(df_others, x='Asset Type', y=['Before Planning', 'After Planning'],
-                        title="Other Asset Types",
-                        labels={'value': 'Dollar Amount', 'variable': 'Planning Stage'},
-                        barmode='group')
-        fig_others.update_layout(xaxis_title="Asset Type", yaxis_title="Dollar Amount")
-        st.plotly_chart(fig_others)
-
-    with tab5:
-        st.session_state.tab4_activated = True
-        st.header("Strategic Recommendations")
-        user_query = create_user_query(results, df)
-        asyncio.run(llm_response(user_query))
-
-
-def convert_json_to_string(json_data):
-    """
-    Convert JSON data to a pretty-formatted string.
+def show_payload_size(figures):
+    # Report what the section costs on the wire, to compare the combined and separate modes
+    sizes = [figure_bytes(fig) for fig in figures]
+    st.caption(f"Chart payload: {sum(sizes) / 1024:,.1f} KB in {len(sizes)} figure(s), largest {max(sizes, default=0) / 1024:,.1f} KB")
 
-    Args:
-    - json_data (dict or list): The JSON data to convert.
 
-    Returns:
-    - str: A pretty-formatted string of the JSON data.
-    """
-    return json.dumps(json_data, indent=4, sort_keys=True)
+def show_asset_type_tab(results, df, cache_key=None):
+    st.header("Asset Type Analysis")
 
+    # Filter dataframes
+    df_qualified = df[df['Asset Type'].str.contains("Qualified") & ~df['Asset Type'].str.contains("Non-Qualified")]
+    df_non_qualified = df[df['Asset Type'].str.contains("Non-Qualified")]
+    df_others = df[~df['Asset Type'].str.contains("Qualified|Non-Qualified")]
 
-def create_user_query(results, df):
-    global dimensions
-    global option_scores
-    # Convert to JSON
-    df_json_string = convert_json_to_string(json.loads(df.to_json(orient='records')))
-    results_string = convert_json_to_string(results)
-    dimensions_string = convert_json_to_string(dimensions)
-    option_scores_string = convert_json_to_string(option_scores)
+    st.divider()
+    # Plot for Qualified
+    fig_qualified = cached_figure(cache_key, "asset_qualified", lambda: create_asset_type_bar_chart(df_qualified, "Qualified Asset Types"))
+    st.plotly_chart(fig_qualified)
 
-    user_query = f"""
-You are an Asset Wealth Manager with strong financial expertise. I need your help in devising three strategies to improve my wealth score. In the ###Data### provided below, all columns remain fixed except for the "After Planning" column. Your task is to devise a reallocation of money in different asset types so that the wealth score is maximized. Use the ###Dimensions_Weight### and ###Options_Score### sections to understand how the wealth score is calculated.
+    st.divider()
+    # Plot for Non-Qualified
+    fig_non_qualified = cached_figure(cache_key, "asset_non_qualified", lambda: create_asset_type_bar_chart(df_non_qualified, "Non-Qualified Asset Types"))
+    st.plotly_chart(fig_non_qualified)
 
-The current results are available in the ###Results### section. Please use the following notes to devise a proper response.
+    st.divider()
+    # Plot for Others
+    fig_others = cached_figure(cache_key, "asset_others", lambda: create_asset_type_bar_chart(df_others, "Other Asset Types"))
+    st.plotly_chart(fig_others)
 
-###Data###
-{df_json_string}
 
-###Dimensions_Weight###
-{dimensions_string}
+def show_attribution_tab(results, df, cache_key=None):
+    st.header("Score Attribution")
+    attribution = cached_result(cache_key, "attribution", lambda: asset_attribution(df))
 
-###Options_Score###
-{option_scores_string}
+    st.divider()
+    st.subheader("Contribution of Each Asset to the After Planning Score")
+    after_attribution = attribution["After Planning"]
+    st.dataframe(after_attribution[after_attribution["Overall"] != 0].style.format("{:.2f}"))
 
-###Results###
-{results_string}
+    st.divider()
+    st.subheader("Contribution of Each Asset to the Before Planning Score")
+    before_attribution = attribution["Before Planning"]
+    st.dataframe(before_attribution[before_attribution["Overall"] != 0].style.format("{:.2f}"))
 
-Notes:
-- Write three strategies without providing numbers for reallocating wealth in different asset types that are better for increasing our wealth score.
-- Remember that we do not require number but strategic guidance on how to reallocate wealth given Asset Types with dimensions.
-- Remember, everything else in the data will remain fixed. Only the "After Planning" column can be changed.
-- Specify both the asset types from which we should reduce wealth and the asset types where we should invest.
-"""
-    return user_query
-    
+    st.divider()
+    st.subheader("Moves with the Highest Score Gain")
+    st.write("Score points gained by moving After Planning dollars from one asset to another, with total wealth unchanged.")
+    st.dataframe(cached_result(cache_key, "top_moves", lambda: top_moves(df)).style.format({"Gain per $1": "{:.6f}", "Gain per $10,000": "{:.2f}"}), hide_index=True)
+
+
+def optimizer_constraints(df, cache_key=None):
+    # Locks and dollar bounds per asset, edited in one table and applied on "Optimize"
+    constraints = pd.DataFrame({
+        "Asset Type": df["Asset Type"],
+        "Current After Planning": df["After Planning"],
+        "Locked": False,
+        "Min $": 0.0,
+        "Max $": None,
+    }).astype({"Max $": float})
+    with st.form("optimizer_constraints"):
+        edited = st.data_editor(
+            constraints,
+            key=f"optimizer_bounds_{(cache_key or '')[:12]}",
+            hide_index=True,
+            disabled=["Asset Type", "Current After Planning"],
+            column_config={
+                "Current After Planning": st.column_config.NumberColumn(format="$%.0f"),
+                "Min $": st.column_config.NumberColumn(min_value=0.0, format="$%.0f"),
+                "Max $": st.column_config.NumberColumn(min_value=0.0, format="$%.0f", help="Leave empty for no upper bound"),
+            },
+        )
+        max_moved = st.number_input("Most dollars to move in total (0 for no limit)", min_value=0.0, value=0.0, step=10_000.0)
+        st.form_submit_button("Optimize")
+    return {
+        "min_amounts": edited["Min $"].fillna(0.0).to_numpy(),
+        "max_amounts": edited["Max $"].fillna(float("inf")).to_numpy(),
+        "locked": edited["Locked"].fillna(False).to_numpy(dtype=bool),
+        "max_moved": max_moved or None,
+    }
 
-async def llm_response(user_query):
+
+def show_optimizer_tab(results, df, cache_key=None):
+    st.header("Optimal Reallocation")
+    st.write("The After Planning allocation with the highest 4D score, with total wealth unchanged and only unlocked assets moved within their bounds.")
+    constraints = optimizer_constraints(df, cache_key)
+    try:
+        optimized = optimize_allocation(df, **constraints)
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Current After Planning Score", f"{optimized['Score Before Optimization']:.2f}")
+    with col2:
+        st.metric(
+            "Optimized After Planning Score",
+            f"{optimized['Score After Optimization']:.2f}",
+            delta=f"{optimized['Score After Optimization'] - optimized['Score Before Optimization']:.2f}",
+        )
+    with col3:
+        st.metric("Dollars Moved", f"${optimized['Amount Moved']:,.0f}")
+
+    st.subheader("Optimized After Planning")
+    allocation = pd.DataFrame({
+        "Asset Type": df["Asset Type"],
+        "Current": df["After Planning"],
+        "Optimized": optimized["After Planning"],
+    })
+    allocation["Change"] = allocation["Optimized"] - allocation["Current"]
+    st.dataframe(allocation.style.format({"Current": "${:,.0f}", "Optimized": "${:,.0f}", "Change": "${:+,.0f}"}), hide_index=True)
+
+    if optimized["Moves"]:
+        st.subheader("Moves")
+        st.dataframe(pd.DataFrame(optimized["Moves"]).style.format({"Amount": "${:,.0f}"}), hide_index=True)
+    else:
+        st.info("No move raises the score within these constraints.")
+
+
+def show_recommendations_tab(results, df, cache_key=None):
+    st.session_state.tab4_activated = True
+    st.header("Strategic Recommendations")
+    user_query = cached_result(cache_key, "prompt", lambda: create_user_query(results, df))
+    stats = cached_result(cache_key, "prompt_stats", lambda: prompt_stats(user_query))
+    st.caption(
+        f"Prompt: {stats['tokens']:,} tokens{'' if stats['exact'] else ' (estimated)'}, {stats['characters']:,} characters, "
+        f"of which {stats['prefix_tokens']:,} tokens are the shared system prefix"
+    )
+
+    # Replay a finished answer instead of querying the agent again when the tab is reopened
+    recommendation = result_cache.get((cache_key, "recommendation")) if cache_key else None
+    if recommendation:
+        llm_agent.render_text_area(st.empty(), 'llm_response', recommendation)
+    else:
+        # Read the request started at Submit; its buffered tokens are shown at once
+        recommendation = asyncio.run(llm_response(user_query, session_llm_stream(user_query)))
+        if recommendation and cache_key:
+            result_cache.put((cache_key, "recommendation"), recommendation)
+
+    if recommendation:
+        show_follow_up_chat(user_query, recommendation, cache_key)
+
+
+def show_follow_up_chat(user_query, recommendation, cache_key=None):
+    # Follow-ups resend the first request unchanged, so the provider can reuse its cached prefix
+    st.subheader("Follow-up Questions")
+    turns = st.session_state.setdefault('follow_ups', {}).setdefault(cache_key, [])
+    for turn in turns:
+        with st.chat_message(turn['role']):
+            st.write(turn['content'])
+
+    question = st.chat_input("Ask a follow-up question about these strategies")
+    if not question:
+        return
+    with st.chat_message('user'):
+        st.write(question)
+    with st.chat_message('assistant'):
+        stream = llm_agent.start_llm_request(follow_up_messages(user_query, recommendation, turns, question))
+        llm_agent.wait_for_slot(stream, st.empty())
+        if not stream.wait_first_chunk():
+            stream.cancel()
+            st.write("The agent could not answer right now, please try again.")
+            return
+        answer = llm_agent.StreamRenderer(st.empty(), f"follow_up_{len(turns)}", height=200).render(stream)
+    if stream.completed:
+        turns += [{'role': 'user', 'content': question}, {'role': 'assistant', 'content': answer}]
+
+
+result_tabs = {
+    "Dimension Analysis": show_dimension_tab,
+    "Redistribution Analysis 1": show_distribution_tab,
+    "Redistribution Analysis 2": show_redistribution_tab,
+    "Asset Type Analysis": show_asset_type_tab,
+    "Score Attribution": show_attribution_tab,
+    "Optimal Reallocation": show_optimizer_tab,
+    "Recommendations": show_recommendations_tab,
+}
+
+
+async def llm_response(user_query, response_stream=None):
         page_placeholders = {}
         page_placeholders['llm_response'] = st.empty()
 
@@ -594,19 +904,280 @@ async def llm_response(user_query):
         with st.spinner(f'Querying Agent for response...'):
             page_placeholders['llm_response'] = components.html(llm_agent.awaiting_response_html, height=300)
 
-        loop = asyncio.get_event_loop()
+        # A new request replaces the session's one; stop it if it is still streaming
+        if response_stream is None:
+            cancel_llm_request()
 
-        result = await loop.create_task(llm_agent.call_llm_agent(user_query = user_query, chat_response_container = page_placeholders['llm_response'],  run_status_element = run_status_element))
+        result = await llm_agent.call_llm_agent(user_query = user_query, chat_response_container = page_placeholders['llm_response'],  run_status_element = run_status_element, response_stream = response_stream, messages = recommendation_messages(user_query))
 
         if not result:
             NULL_REPONSE = {
                 'agent_response':default_response,
             }
             llm_agent.render_text_area(page_placeholders['llm_response'], 'llm_response', NULL_REPONSE['agent_response'])
+            return None
 
         else:
             run_status_element.empty()
-            llm_agent.render_text_area(page_placeholders['llm_response'], 'llm_response', result['agent_response'])
+            stream = result['agent_response']
+            st.session_state['llm_stream'] = stream
+            st.session_state['llm_stream_query'] = user_query
+            renderer = llm_agent.StreamRenderer(page_placeholders['llm_response'], 'llm_response')
+            recommendation = renderer.render(stream)
+            show_stream_stats(renderer.stats())
+            if stream.queue_seconds >= 1:
+                st.caption(f"Waited {stream.queue_seconds:.1f} s for a free agent slot.")
+            if stream.cached:
+                st.caption("Replayed from the response cache.")
+            if not stream.completed:
+                # Keep the partial answer on screen but do not remember it as the recommendation
+                st.warning("The recommendation was cut short; submit again to retry.")
+                return None
+            return recommendation
+
+
+def cancel_llm_request():
+    stream = st.session_state.pop('llm_stream', None)
+    st.session_state.pop('llm_stream_query', None)
+    if stream is not None:
+        stream.cancel()
+
+
+def start_recommendation(results, df, cache_key):
+    # Start the agent as soon as the prompt exists, so its first tokens arrive while the charts render
+    if result_cache.get((cache_key, "recommendation")):
+        return
+    user_query = cached_result(cache_key, "prompt", lambda: create_user_query(results, df))
+    st.session_state['llm_stream'] = llm_agent.start_llm_request(recommendation_messages(user_query))
+    st.session_state['llm_stream_query'] = user_query
+
+
+def session_llm_stream(user_query):
+    # The session's request for this prompt, if one was started and is still usable
+    stream = st.session_state.get('llm_stream')
+    if st.session_state.get('llm_stream_query') == user_query and stream is not None and not stream.cancelled:
+        return stream
+    return None
+
+
+def show_stream_stats(stats):
+    # Delivery rate of the streamed answer, as seen by the browser
+    first_token = f"{stats['first_token_seconds']:.2f} s" if stats['first_token_seconds'] is not None else "n/a"
+    st.caption(
+        f"Streamed {stats['tokens']} tokens in {stats['seconds']:.1f} s "
+        f"({stats['tokens_per_second']:.0f} tokens/s, first token after {first_token}, {stats['frames']} screen updates)"
+    )
+
+
+def show_score_preview(scorer):
+    # Live overall scores from the running option sums, refreshed on every grid edit
+    scores = scorer.scores()
+    before_score = float(scores["Overall Before Planning Score"])
+    after_score = float(scores["Overall After Planning Score"])
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Live Before Planning 4D Wealth Score", f"{before_score:.2f}")
+    with col2:
+        st.metric("Live After Planning 4D Wealth Score", f"{after_score:.2f}", delta=f"{after_score - before_score:.2f}")
+
+
+# Rows of the planning form with default values, built once per process
+default_form_data = {
+    "Asset Type": [
+        "Marketable Securities (Non-Qualified)",
+        "Private Equity (Non-Qualified)",
+        "Real Estate (Non-Qualified)",
+        "Hedge Fund (Non-Qualified)",
+        "Credit (Non-Qualified)",
+        "Marketable Securities (Qualified)",
+        "Life Insurance (Qualified)",
+        "Annuity (Qualified)",
+        "Deferred Comp, SERP, or other (Non-Qualified)",
+        "Roth IRA, Roth 401k, Roth Annuity",
+        "Life Insurance",
+        "Split-Dollar Life Insurance",
+        "Annuity",
+        "Private Business",
+        "Stock Options",
+        "Artwork / Collectibles",
+        "Digital Assets",
+        "Charitable"
+    ],
+    "Before Planning": [
+        500000.00, 50000.00, 860000.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0, 0.00, 0, 0, 0.00, 0.00, 0.00, 0.00, 0.00
+    ],
+    "After Planning": [
+        0.00, 50000.00, 400000.00, 0.00, 0.00, 100000.00, 30000.00, 0.00, 0.00, 400000.00, 0.00, 100000.00, 100000.00, 0.00, 0.00, 0.00, 0.00, 230000.00
+    ],
+    "D1: Taxation on Funding": [
+        "Pre-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "Pre-Tax", "Pre-Tax", "Pre-Tax", "Pre-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "Pre-Tax"
+    ],
+    "% D1 (if partially pre-tax)": [
+        "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "50%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%"
+    ],
+    "D2: Taxation on Growth": [
+        "Taxable/Capital Gain", "Taxable/Ordinary Income", "Taxable/Capital Gain", "Taxable/Ordinary Income", "Taxable/Ordinary Income", "Tax-Deferred", "Tax-Deferred", "Tax-Deferred", "Tax-Deferred", "Tax-Free", "Tax-Deferred", "Tax-Deferred", "Tax-Deferred", "Taxable/Ordinary Income", "Tax-Deferred", "Tax-Deferred", "Taxable/Ordinary Income", "Tax-Free"
+
+        ],
+    "D3: Taxation on Distribution": [
+        "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Not taxable", "Taxable/Capital Gain", "Taxable/Ordinary Income", "Not taxable", "Not taxable", "Not taxable", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Not taxable"
+    ],
+    "D4: Taxation on Death": [
+        "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes"
+    ],
+    "D5: Asset Protection": [
+        "No", "No", "No", "No", "No", "Yes", "Yes", "Yes", "No", "Partially", "Yes", "Yes", "Partially", "No", "No", "No", "No", "Yes"
+    ],
+    "% D5 (if partially pre-tax)": [
+        "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "50%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%"
+    ],
+    "D6: Charitable Deduction": [
+        "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "Yes"
+    ]
+}
+
+
+# Grid options per form schema; building them walks every column, so it is done once per process
+grid_options_cache = {}
+
+
+def planning_grid_options(form_data):
+    """
+    Grid options of the planning form, built once per schema and scoring-config version.
+
+    Args:
+    - form_data (pd.DataFrame): The raw form the grid is created from.
+
+    Returns:
+    - dict: A shallow copy of the cached options; AgGrid adds "rowData" to the dict it is given.
+    """
+    schema = (scoring_config.version, tuple((column, dtype.str) for column, dtype in form_data.dtypes.items()))
+    if schema not in grid_options_cache:
+        # Define the GridOptionsBuilder object
+        gb = GridOptionsBuilder.from_dataframe(form_data.head(0))
+
+        # Define dropdown lists for each dimension
+        for dimension, props in dimensions.items():
+            gb.configure_column(f"{dimension}: {props['label']}",
+                                editable=True,
+                                cellEditor='agSelectCellEditor',
+                                cellEditorParams={'values': props['options']},
+                                width=200,
+                                wrapText = True,
+                                autoHeight = True)  # Set the width of each dimension column
+
+        # Make the columns for asset type and before/after planning editable but not dropdowns
+        gb.configure_column("Asset Type", editable=False, width=350, wrapText = True, autoHeight = True, pinned='left')  # Read-only
+        gb.configure_column("Before Planning", editable=True, width=150, pinned='left')
+        gb.configure_column("After Planning", editable=True, width=150, pinned='left')
+        gb.configure_column("% D1 (if partially pre-tax)", editable=True, width=180)  # Editable percentage input
+        gb.configure_column("% D5 (if partially pre-tax)", editable=True, width=180)  # Editable percentage input
+
+        grid_options_cache[schema] = gb.build()
+    return dict(grid_options_cache[schema])
+
+
+def grid_row_data(form_data):
+    # Rows in the JSON layout AgGrid expects, with the row id it uses to report edits
+    rows = form_data.assign(__pandas_index=[str(i) for i in range(len(form_data))])
+    return json.loads(rows.to_json(orient='records'))
+
+
+def apply_grid_edit(event):
+    """
+    Apply one "cellValueChanged" event of the grid to the session's typed form, errors and scorer.
+
+    Returns:
+    - bool: True if the event was new and applied.
+    """
+    if not event or event.get('type') != 'cellValueChanged':
+        return False
+    column = event.get('colDef', {}).get('field')
+    row = int(event.get('data', {}).get('__pandas_index', event.get('rowIndex')))
+    edit = (row, column, event.get('oldValue'), event.get('newValue'))
+    # A rerun that was not caused by the grid hands back its last event again
+    if st.session_state.get('last_grid_edit') == edit:
+        return False
+    st.session_state['last_grid_edit'] = edit
+
+    typed_value, st.session_state['form_errors'] = ingest_cell(
+        st.session_state['typed_form'], st.session_state['form_errors'], row, column, event.get('newValue'))
+    st.session_state['scorer'].update_cell(row, column, typed_value)
+    return True
+
+
+def sync_grid_form(grid_response):
+    # Full reconciliation with every row the grid holds, used once at Submit
+    if grid_response.grid_response.get('nodes') is None:
+        return
+    grid_data = grid_response.data
+    grid_data = grid_data.sort_index(key=lambda index: index.astype(int)).reset_index(drop=True)
+    typed_form, form_errors = ingest_form(grid_data)
+    if not typed_form.equals(st.session_state['typed_form']):
+        st.session_state['typed_form'] = typed_form
+        st.session_state['form_errors'] = form_errors
+        st.session_state['scorer'] = IncrementalScorer(typed_form)
+
+
+@st.experimental_fragment
+def show_planning_form():
+    """
+    Render the editable planning grid, the live score preview and the Submit button.
+
+    Runs as a fragment: a cell edit reruns only this function, not the introduction,
+    the form defaults or the results section. Submit reruns the whole page.
+
+    The grid is sent the session's rows once and reports each edit as one changed
+    cell, which is applied in place to the typed form and the running scorer.
+    """
+    # Convert the form once per session; later edits arrive cell by cell
+    if 'typed_form' not in st.session_state:
+        st.session_state['grid_rows'] = grid_row_data(st.session_state['form_data'])
+        st.session_state['typed_form'], st.session_state['form_errors'] = ingest_form(st.session_state['form_data'])
+        st.session_state['scorer'] = IncrementalScorer(st.session_state['typed_form'])
+
+    grid_options = planning_grid_options(st.session_state['form_data'])
+    grid_options['rowData'] = st.session_state['grid_rows']
+
+    st.header("4D Wealth Planning Form")
+
+    # Display the editable grid
+    grid_response = AgGrid(
+        None,
+        gridOptions=grid_options,
+        editable=True,
+        update_mode=GridUpdateMode.VALUE_CHANGED,
+        data_return_mode=DataReturnMode.AS_INPUT,
+        key='grid1'
+
+    )
+    apply_grid_edit(grid_response.grid_response.get('eventData'))
+
+    form_errors = st.session_state['form_errors']
+    if len(form_errors):
+        st.warning(f"{len(form_errors)} cell(s) could not be read and are counted as 0 or left blank.")
+        st.dataframe(form_errors, hide_index=True)
+
+    show_score_preview(st.session_state['scorer'])
+
+    # Handle form submission
+    if st.button("Submit"):
+        cancel_llm_request()
+        sync_grid_form(grid_response)
+        # The typed form keeps changing in place, the submission gets its own copy
+        df = st.session_state['typed_form'].copy()
+        # Identical portfolios share results, prompt and figures across reruns and sessions
+        cache_key = portfolio_key(df)
+        # with pd.ExcelWriter("wealth_planning_form.xlsx", engine='openpyxl') as writer:
+        #     df.to_excel(writer, index=False)
+        # st.success("Form submitted successfully! Data saved to `wealth_planning_form.xlsx`.")
+        # Calculate the wealth score
+        results = cached_result(cache_key, "results", lambda: calculate_wealth_score(df))
+        # Keep the submission so switching result sections (a rerun) still shows it
+        st.session_state['submission'] = {'results': results, 'form': df, 'cache_key': cache_key}
+        start_recommendation(results, df, cache_key)
+        # Leave the fragment so the results section is rendered with the new submission
+        st.rerun()
 
 
 # Main function to control app flow
@@ -679,16 +1250,6 @@ def show():
     """)
     st.divider()
 
-    # Define the dimensions and their options
-    dimensions = {
-        "D1": {"label": "Taxation on Funding", "options": ["Pre-Tax", "Partially Pre-Tax", "After-Tax"]},
-        "D2": {"label": "Taxation on Growth", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Tax-Deferred", "Tax-Free"]},
-        "D3": {"label": "Taxation on Distribution", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Not taxable"]},
-        "D4": {"label": "Taxation on Death", "options": ["Yes", "No"]},
-        "D5": {"label": "Asset Protection", "options": ["Yes", "No", "Partially"]},
-        "D6": {"label": "Charitable Deduction", "options": ["Yes", "No"]}
-    }
-
     # # Define the rows of the table
     # rows = [
     #     "Marketable Securities (Non-Qualified)",
@@ -726,84 +1287,9 @@ def show():
     #         "% D5 (if partially pre-tax)": [""] * len(rows),
     #         "D6: Charitable Deduction": [""] * len(rows),
     #     })
-    # Define the rows of the table with default values
-    data = {
-        "Asset Type": [
-            "Marketable Securities (Non-Qualified)",
-            "Private Equity (Non-Qualified)",
-            "Real Estate (Non-Qualified)",
-            "Hedge Fund (Non-Qualified)",
-            "Credit (Non-Qualified)",
-            "Marketable Securities (Qualified)",
-            "Life Insurance (Qualified)",
-            "Annuity (Qualified)",
-            "Deferred Comp, SERP, or other (Non-Qualified)",
-            "Roth IRA, Roth 401k, Roth Annuity",
-            "Life Insurance",
-            "Split-Dollar Life Insurance",
-            "Annuity",
-            "Private Business",
-            "Stock Options",
-            "Artwork / Collectibles",
-            "Digital Assets",
-            "Charitable"
-        ],
-        "Before Planning": [
-            500000.00, 50000.00, 860000.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0, 0.00, 0, 0, 0.00, 0.00, 0.00, 0.00, 0.00
-        ],
-        "After Planning": [
-            0.00, 50000.00, 400000.00, 0.00, 0.00, 100000.00, 30000.00, 0.00, 0.00, 400000.00, 0.00, 100000.00, 100000.00, 0.00, 0.00, 0.00, 0.00, 230000.00
-        ],
-        "D1: Taxation on Funding": [
-            "Pre-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "Pre-Tax", "Pre-Tax", "Pre-Tax", "Pre-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "After-Tax", "Pre-Tax"
-        ],
-        "% D1 (if partially pre-tax)": [
-            "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "50%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%"
-        ],
-        "D2: Taxation on Growth": [
-            "Taxable/Capital Gain", "Taxable/Ordinary Income", "Taxable/Capital Gain", "Taxable/Ordinary Income", "Taxable/Ordinary Income", "Tax-Deferred", "Tax-Deferred", "Tax-Deferred", "Tax-Deferred", "Tax-Free", "Tax-Deferred", "Tax-Deferred", "Tax-Deferred", "Taxable/Ordinary Income", "Tax-Deferred", "Tax-Deferred", "Taxable/Ordinary Income", "Tax-Free"
-
-            ],
-        "D3: Taxation on Distribution": [
-            "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Not taxable", "Taxable/Capital Gain", "Taxable/Ordinary Income", "Not taxable", "Not taxable", "Not taxable", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Taxable/Capital Gain", "Not taxable"
-        ],
-        "D4: Taxation on Death": [
-            "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes", "Yes"
-        ],
-        "D5: Asset Protection": [
-            "No", "No", "No", "No", "No", "Yes", "Yes", "Yes", "No", "Partially", "Yes", "Yes", "Partially", "No", "No", "No", "No", "Yes"
-        ],
-        "% D5 (if partially pre-tax)": [
-            "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "50%", "0%", "0%", "0%", "0%", "0%", "0%", "0%", "0%"
-        ],
-        "D6: Charitable Deduction": [
-            "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "No", "Yes"
-        ]
-    }
-
     # Initialize session state for storing form data
     if 'form_data' not in st.session_state:
-        st.session_state['form_data'] = pd.DataFrame(data)
-
-    # Define the GridOptionsBuilder object
-    gb = GridOptionsBuilder.from_dataframe(st.session_state['form_data'])
-    
-    # Define dropdown lists for each dimension
-    for dimension, props in dimensions.items():
-        gb.configure_column(f"{dimension}: {props['label']}", 
-                            editable=True, 
-                            cellEditor='agSelectCellEditor', 
-                            cellEditorParams={'values': props['options']},
-                            width=200,
-                            wrapText = True,
-                            autoHeight = True)  # Set the width of each dimension column
-
-    # Make the columns for asset type and before/after planning editable but not dropdowns
-    gb.configure_column("Asset Type", editable=False, width=350, wrapText = True, autoHeight = True, pinned='left')  # Read-only
-    gb.configure_column("Before Planning", editable=True, width=150, pinned='left')
-    gb.configure_column("After Planning", editable=True, width=150, pinned='left')
-    gb.configure_column("% D1 (if partially pre-tax)", editable=True, width=180)  # Editable percentage input
-    gb.configure_column("% D5 (if partially pre-tax)", editable=True, width=180)  # Editable percentage input
+        st.session_state['form_data'] = pd.DataFrame(default_form_data)
 
     # Add custom CSS for header text wrapping
     custom_css = """
@@ -825,29 +1311,11 @@ def show():
     """
     st.markdown(custom_css, unsafe_allow_html=True)
 
-    # Build the grid options
-    grid_options = gb.build()
-    
+    # Edits rerun only the form fragment; the results below rerun on Submit
+    show_planning_form()
 
-    st.header("4D Wealth Planning Form")
-
-    # Display the editable grid
-    grid_response = AgGrid(
-        st.session_state['form_data'],
-        gridOptions=grid_options,
-        editable=True,
-        key='grid1'
-
-    )
-    st.session_state['form_data'] = grid_response['data']
-    # Handle form submission
-    if st.button("Submit"):
-        df = pd.DataFrame(st.session_state['form_data'])
-        # with pd.ExcelWriter("wealth_planning_form.xlsx", engine='openpyxl') as writer:
-        #     df.to_excel(writer, index=False)
-        # st.success("Form submitted successfully! Data saved to `wealth_planning_form.xlsx`.")
-        # Calculate the wealth score
-        results = calculate_wealth_score(df)
-        display_wealth_score_results(results, df)
+    if 'submission' in st.session_state:
+        submission = st.session_state['submission']
+        display_wealth_score_results(submission['results'], submission['form'], submission['cache_key'])
 
       
\ No newline at end of file
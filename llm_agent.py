@@ -1,11 +1,35 @@
 from llama_index.llms.openai import OpenAI as OpenAI_llama
 from llama_index.core.base.response.schema import StreamingResponse
-from openai import OpenAI, Stream
-import re
+from openai import AsyncOpenAI, Stream
 import asyncio
+import contextlib
+import threading
+import time
+import httpx
+import os
 import streamlit as st
+from utils.llm_cache import response_cache, recommendation_store, replay_chunks
+from utils.admission import Ticket, llm_admission, llm_max_retries, is_rate_limited, backoff_seconds
 
-client = OpenAI(api_key=st.secrets['OPEN_AI_KEY'])
+# Backend the recommendations are requested from: "openai" for the live API, or "stub"
+# for the local stand-in in utils/llm_stub.py (no key or network needed)
+llm_backend_name = os.environ.get('MAGNUS_LLM_BACKEND', 'openai')
+
+# Service levels of one recommendation, in seconds. A request that cannot get a slot,
+# connect, produce its first token or finish within these limits is abandoned and the
+# page falls back to the default response. Time in the queue is not part of 'total'.
+# A request nobody has read for 'idle' seconds, e.g. because its session ended or the
+# Recommendations tab was never opened, is cancelled and gives its slot back.
+llm_timeouts = {
+    'idle': 60.0,
+    'queue': 60.0,
+    'connect': 5.0,
+    'first_token': 20.0,
+    'total': 120.0,
+}
+
+# Speed at which cached answers are replayed through the renderer; 0 shows them at once
+llm_replay_tokens_per_second = float(os.environ.get('MAGNUS_LLM_REPLAY_TPS', '0'))
 
 awaiting_response_html = """
 <style>
@@ -54,73 +78,469 @@ margin:0px !important;
 </div>
 """
 
-# General purpose function for rendering a text area - write a separation function is a bespoke logic is needed
-def render_text_area(container, label, stream):
+# Markdown markers stripped from the agent's answer; "**" is two "*", so removing the
+# characters one by one per chunk gives the same text as cleaning the whole answer
+markdown_markers = str.maketrans('', '', '*_`#')
 
-    chunk_counter = 0
-    cumul_response = ''
 
-    # Generate text area
+def iter_stream_text(stream):
+    # Text chunks of a finished string, an OpenAI stream, a llama_index stream or any iterable of str
     if isinstance(stream, str):
-        cumul_response = stream
-        container.text_area(
-            label=label, 
-            label_visibility='collapsed', 
-            value=re.sub(r'\*\*|\*|_|`|#', '', cumul_response), 
-            key=label,
-            height=400
-        )
-
-    # streaming response - OpenAI
+        yield stream
     elif isinstance(stream, Stream):
         for chunk in stream:
-            chunk_counter += 1
-            content = chunk.choices[0].delta.content or ""
-            unique_key = f"{label}_cumul_response_{chunk_counter}"
-            cumul_response += content
-            container.text_area(
-                label=label, 
-                label_visibility='collapsed', 
-                value=re.sub(r'\*\*|\*|_|`|#', '', cumul_response), 
-                key=unique_key, 
-                height=400
-            )
-
-    # streaming response - llama_index
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
     elif isinstance(stream, StreamingResponse):
-        for chunk in stream.response_gen:
-            chunk_counter += 1
-            unique_key = f"{label}_cumul_response_{chunk_counter}"
-            cumul_response += chunk
-            container.text_area(
-                label=label, 
-                label_visibility='collapsed', 
-                value=re.sub(r'\*\*|\*|_|`|#', '', cumul_response), 
-                key=unique_key, 
-                height=400
+        yield from stream.response_gen
+    else:
+        yield from stream
+
+
+class StreamRenderer:
+    """
+    Renders a streamed answer into one text area, at most `frame_rate` times per second.
+
+    Chunks are cleaned of markdown as they arrive and the element is replaced in place,
+    so the work per answer is linear in its length and the number of UI updates is
+    bounded by the frame rate, not by the number of tokens.
+    """
+
+    def __init__(self, container, label, frame_rate=10, height=400):
+        self.container = container
+        self.label = label
+        self.frame_interval = 1 / frame_rate
+        self.height = height
+        self.parts = []
+        self.chunks = 0
+        self.frames = 0
+        self.started = None
+        self.first_chunk = None
+        self.last_frame = 0.0
+        self.finished = None
+        self.drawn = None
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+    def feed(self, chunk):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        if chunk and self.first_chunk is None:
+            self.first_chunk = now
+        self.chunks += 1
+        self.parts.append(chunk.translate(markdown_markers))
+        # Empty and markdown-only chunks leave the text as it was; nothing to redraw
+        if now - self.last_frame >= self.frame_interval and self.text != self.drawn:
+            self.draw(key=f"{self.label}_frame_{self.frames}")
+            self.last_frame = now
+
+    def draw(self, key):
+        # Every frame gets its own key, so two frames never share a widget id even with equal text
+        self.drawn = self.text
+        self.container.text_area(
+            label=self.label,
+            label_visibility='collapsed',
+            value=self.text,
+            key=key,
+            height=self.height
+        )
+        self.frames += 1
+
+    def render(self, stream):
+        self.started = time.perf_counter()
+        chunks = iter_stream_text(stream)
+        try:
+            for chunk in chunks:
+                self.feed(chunk)
+        finally:
+            # A rerun mid-stream only stops this reader; the request keeps buffering
+            chunks.close()
+        self.finished = time.perf_counter()
+        self.draw(key=self.label)
+        return self.text
+
+    def stats(self):
+        """
+        Streaming statistics of the last `render` call.
+
+        Returns:
+        - dict: Chunks received (one token each on the OpenAI stream), frames drawn, seconds
+          to the first chunk, total seconds and tokens per second delivered to the browser.
+        """
+        started = self.started or 0.0
+        seconds = (self.finished or time.perf_counter()) - started
+        return {
+            'tokens': self.chunks,
+            'frames': self.frames,
+            'first_token_seconds': (self.first_chunk - started) if self.first_chunk else None,
+            'seconds': seconds,
+            'tokens_per_second': self.chunks / seconds if seconds > 0 else 0.0,
+        }
+
+
+# General purpose function for rendering a text area - write a separation function is a bespoke logic is needed
+def render_text_area(container, label, stream, frame_rate=10):
+    return StreamRenderer(container, label, frame_rate=frame_rate).render(stream)
+
+
+
+# One event loop thread per process runs every request, so the async client and its
+# connection pool are created once and reused by all sessions
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_backend = None
+
+
+def get_event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='llm-event-loop', daemon=True).start()
+    return _loop
+
+
+def get_api_key():
+    # Read on first use, so the stub backend runs without any key configured
+    try:
+        return st.secrets['OPEN_AI_KEY']
+    except Exception:
+        return os.environ.get('OPENAI_API_KEY')
+
+
+def get_client():
+    # Only called on the event loop thread; the pool is bound to that loop
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=get_api_key(),
+            timeout=httpx.Timeout(llm_timeouts['total'], connect=llm_timeouts['connect']),
+            max_retries=0,
+        )
+    return _client
+
+
+class OpenAIBackend:
+    """
+    Streams chat completions from the OpenAI API.
+
+    A backend is any object whose `stream(messages, model, temperature)` is an async
+    generator of text chunks; see `utils.llm_stub.StubBackend` for the local one.
+    """
+
+    name = 'openai'
+
+    async def stream(self, messages, model, temperature):
+        response = await get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            temperature=temperature,
+        )
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if llm_backend_name == 'stub':
+            from utils.llm_stub import StubBackend
+
+            _backend = StubBackend()
+        elif llm_backend_name == 'openai':
+            _backend = OpenAIBackend()
+        else:
+            raise ValueError(f"Unknown MAGNUS_LLM_BACKEND: {llm_backend_name}")
+    return _backend
+
+
+def set_backend(backend):
+    # Replace the backend of every later request, e.g. with a StubBackend in benchmarks
+    global _backend
+    _backend = backend
+
+
+def cache_model(model):
+    # Stored answers are tied to the backend, so stub text is never replayed as a live answer
+    backend = get_backend()
+    return model if backend.name == 'openai' else f"{backend.name}:{model}"
+
+
+class LLMStream:
+    """
+    A chat completion streamed on the background event loop.
+
+    The request first waits for a slot of `llm_admission`, in arrival order, and is
+    retried with backoff while the provider answers 429. Tokens are buffered as they
+    arrive, so the request can start before anyone reads it and every reader sees the
+    whole answer from the first token: the first pass replays the buffer at once and
+    then follows the live stream. Readers never wait on the network for longer than
+    the remaining time budget. `cancel` stops the request and closes its connection;
+    a request that nobody reads for `timeouts['idle']` seconds cancels itself.
+    """
+
+    def __init__(self, messages, model="gpt-4o", temperature=0.1, timeouts=None):
+        self.messages = messages
+        self.model = model
+        self.temperature = temperature
+        self.timeouts = {**llm_timeouts, **(timeouts or {})}
+        self.received = []
+        self.condition = threading.Condition()
+        self.finished = False
+        self.error = None
+        self.completed = False
+        self.cancelled = False
+        self.deadline = None
+        self.future = None
+        self.chunks = None
+        self.cached = False
+        self.ticket = Ticket()
+        self.retries = 0
+        self.readers = 0
+        self.last_read = time.monotonic()
+        self.idle_expired = False
+
+    def start(self):
+        self.last_read = time.monotonic()
+        # Pushed back to the end of the queue wait once a slot is granted
+        self.deadline = time.monotonic() + self.timeouts['queue'] + self.timeouts['total']
+        self.future = asyncio.run_coroutine_threadsafe(self._run(), get_event_loop())
+        return self
+
+    @property
+    def text(self):
+        return ''.join(self.received)
+
+    @property
+    def queue_position(self):
+        return llm_admission.position(self.ticket)
+
+    @property
+    def queue_seconds(self):
+        return self.ticket.wait_seconds
+
+    async def _open(self):
+        # Send the request and read up to the first chunk
+        self.chunks = get_backend().stream(self.messages, self.model, self.temperature)
+        return await self.chunks.__anext__()
+
+    async def _open_with_retries(self):
+        # The first token has its own, shorter limit per attempt; only the request itself is
+        # retried, so no text is ever streamed twice
+        while True:
+            try:
+                return await asyncio.wait_for(self._open(), self.timeouts['first_token'])
+            except TimeoutError:
+                raise TimeoutError(f"No first token within {self.timeouts['first_token']} s")
+            except Exception as e:
+                if not is_rate_limited(e) or self.retries >= llm_max_retries:
+                    raise
+                llm_admission.record_rate_limit()
+                # The slot is kept while backing off, so the retry does not queue again
+                await asyncio.sleep(backoff_seconds(e, self.retries))
+                self.retries += 1
+
+    @contextlib.contextmanager
+    def reading(self):
+        # Marks a reader as attached; the idle timeout only runs while nobody reads
+        with self.condition:
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                self.last_read = time.monotonic()
+
+    async def _watch_idle(self, task):
+        while True:
+            await asyncio.sleep(min(self.timeouts['idle'], 1.0))
+            with self.condition:
+                idle = not self.readers and time.monotonic() - self.last_read > self.timeouts['idle']
+            if idle:
+                self.idle_expired = True
+                task.cancel()
+                return
+
+    async def _run(self):
+        watchdog = asyncio.create_task(self._watch_idle(asyncio.current_task()))
+        try:
+            try:
+                async with asyncio.timeout(self.timeouts['queue']):
+                    await llm_admission.acquire(self.ticket)
+            except TimeoutError:
+                raise TimeoutError(f"No free agent slot within {self.timeouts['queue']} s")
+            with self.condition:
+                self.deadline = time.monotonic() + self.timeouts['total']
+                self.condition.notify_all()
+            async with asyncio.timeout(self.timeouts['total']):
+                chunk = await self._open_with_retries()
+                while True:
+                    with self.condition:
+                        self.received.append(chunk)
+                        self.condition.notify_all()
+                    chunk = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            watchdog.cancel()
+            self.completed = True
+            # Only whole answers are stored for replay
+            await asyncio.to_thread(response_cache.put, self.messages, cache_model(self.model), self.temperature, self.text)
+        except asyncio.CancelledError:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+        finally:
+            watchdog.cancel()
+            if self.chunks is not None:
+                await self.chunks.aclose()
+            llm_admission.release(self.ticket, ok=self.completed)
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def wait_admitted(self, timeout=None):
+        # Block until the request holds a slot or has ended; False if still queued
+        with self.reading(), self.condition:
+            return self.condition.wait_for(lambda: self.ticket.admitted is not None or self.finished, timeout=timeout)
+
+    def wait_first_chunk(self):
+        # Block until the first token arrives or the request ends; False if nothing came.
+        # `_run` ends by the deadline, retries included, so this cannot wait longer.
+        with self.reading(), self.condition:
+            self.condition.wait_for(
+                lambda: self.received or self.finished,
+                timeout=max(self.deadline - time.monotonic(), 0) + 1,
             )
-            
-    return cumul_response
+            return bool(self.received)
+
+    def cancel(self):
+        if self.future is not None and not self.future.done():
+            self.cancelled = True
+            self.future.cancel()
+
+    def __iter__(self):
+        with self.reading():
+            yield from self._follow()
+
+    def _follow(self):
+        position = 0
+        while True:
+            with self.condition:
+                arrived = self.condition.wait_for(
+                    lambda: len(self.received) > position or self.finished,
+                    timeout=max(self.deadline - time.monotonic(), 0),
+                )
+                if not arrived:
+                    self.error = TimeoutError("The recommendation did not finish in time")
+                    return
+                if len(self.received) == position:
+                    return
+                chunks = self.received[position:]
+            position += len(chunks)
+            yield from chunks
 
 
+class ReplayStream:
+    """
+    A stored answer, read through the same interface as `LLMStream`.
+    """
+
+    def __init__(self, text, tokens_per_second=0.0):
+        self.received = [text]
+        self.tokens_per_second = tokens_per_second
+        self.finished = True
+        self.completed = True
+        self.cancelled = False
+        self.error = None
+        self.cached = True
+        self.queue_position = None
+        self.queue_seconds = 0.0
+
+    @property
+    def text(self):
+        return self.received[0]
+
+    def wait_admitted(self, timeout=None):
+        return True
+
+    def wait_first_chunk(self):
+        return True
+
+    def cancel(self):
+        pass
+
+    def __iter__(self):
+        return replay_chunks(self.text, self.tokens_per_second)
+
+
+def queue_message(position):
+    return f'All agents are busy: you are number {position} in the queue'
+
+
+def wait_for_slot(stream, status_element=None, interval=0.5):
+    # Show the queue position while the request waits, until it holds a slot or has ended
+    while not stream.wait_admitted(interval):
+        position = stream.queue_position
+        if status_element and position:
+            status_element.code(queue_message(position), language="plaintext")
+    if status_element:
+        status_element.empty()
+
+
+def stored_response(request):
+    # A live answer to the same request, else one precomputed by batch_recommend.py
+    key = (request.messages, cache_model(request.model), request.temperature)
+    cached = response_cache.get(*key)
+    return cached if cached is not None else recommendation_store.get(*key)
+
+
+def start_llm_request(messages):
+    # Replay a stored answer to the same request, or start streaming a new one in the background
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    request = LLMStream(messages=messages)
+    cached = stored_response(request)
+    if cached is not None:
+        return ReplayStream(cached, llm_replay_tokens_per_second)
+    return request.start()
+
 
 async def call_llm_agent(
         user_query: str, 
         chat_response_container = None, 
         run_status_element = None,
-        return_stream = True
+        return_stream = True,
+        response_stream = None,
+        messages = None
     ):
     try:
         if run_status_element:
             run_status_element.code('Agent is producing appropriate response', language="plaintext")
-        response_stream = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "user", "content": user_query}
-                ],
-                stream=True,
-                temperature=0.1 # medium temperature for this mode
-            )
+        # Adopt a request started ahead of time, e.g. at Submit
+        if response_stream is None:
+            response_stream = start_llm_request(messages or user_query)
+
+        # Show the queue position until the request gets a slot
+        while not await asyncio.to_thread(response_stream.wait_admitted, 0.5):
+            position = response_stream.queue_position
+            if run_status_element and position:
+                run_status_element.code(queue_message(position), language="plaintext")
+        if run_status_element:
+            run_status_element.code('Agent is producing appropriate response', language="plaintext")
+
+        # Fall back early when the request fails or stalls before its first token
+        if not await asyncio.to_thread(response_stream.wait_first_chunk):
+            response_stream.cancel()
+            raise response_stream.error or TimeoutError("No response within the first-token limit")
 
         # ticker dashboard
         if return_stream:
@@ -131,7 +551,8 @@ async def call_llm_agent(
     
     except Exception as e:
         print(f"Error Occured: {e}")
-        run_status_element.empty()
+        if run_status_element:
+            run_status_element.empty()
         return None
     
 
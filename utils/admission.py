@@ -0,0 +1,172 @@
+# utils/admission.py
+# Process-wide admission control for agent requests. Every session of the process
+# shares one provider quota, so at most `max_concurrent` requests are in flight and the
+# rest wait in one first-in, first-out queue whose positions the page can show. Wait
+# times, completions and rate-limit retries are recorded for the throughput metrics.
+import asyncio
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+
+
+class Ticket:
+    # One request's place in the queue; `granted` is set once it holds a slot
+    def __init__(self):
+        self.enqueued = time.monotonic()
+        self.admitted = None
+        self.future = None
+        self.granted = False
+
+    @property
+    def wait_seconds(self):
+        return (self.admitted or time.monotonic()) - self.enqueued
+
+
+class AdmissionController:
+    """
+    Concurrency cap with a fair FIFO queue, shared by the threads and event loops of a process.
+
+    Await `acquire(ticket)` before a request and call `release(ticket, ok)` once it has
+    ended; `position(ticket)` is safe to call from any thread while the request waits.
+    """
+
+    def __init__(self, max_concurrent, window_seconds=60.0):
+        self.max_concurrent = max_concurrent
+        self.window_seconds = window_seconds
+        self.lock = threading.Lock()
+        self.queue = deque()
+        self.active = 0
+        self.admitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.waits = deque(maxlen=1000)
+        self.finishes = deque()
+
+    def _grant(self, ticket):
+        # Called with the lock held
+        self.active += 1
+        self.admitted += 1
+        ticket.granted = True
+        ticket.admitted = time.monotonic()
+        self.waits.append(ticket.wait_seconds)
+
+    def _admit_waiting(self):
+        # Hand free slots to the head of the queue; called with the lock held
+        while self.queue and self.active < self.max_concurrent:
+            ticket = self.queue.popleft()
+            self._grant(ticket)
+            loop = ticket.future.get_loop()
+            loop.call_soon_threadsafe(lambda future=ticket.future: future.done() or future.set_result(True))
+
+    async def acquire(self, ticket):
+        with self.lock:
+            # Nobody may overtake a request that is already waiting
+            if not self.queue and self.active < self.max_concurrent:
+                self._grant(ticket)
+                return
+            ticket.future = asyncio.get_running_loop().create_future()
+            self.queue.append(ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self.lock:
+                if ticket in self.queue:
+                    self.queue.remove(ticket)
+                    raise
+            # The slot was granted as the wait was cancelled; give it back
+            self.release(ticket, ok=False)
+            raise
+
+    def release(self, ticket, ok=True):
+        with self.lock:
+            if not ticket.granted:
+                return
+            ticket.granted = False
+            self.active -= 1
+            if ok:
+                self.completed += 1
+                self.finishes.append(time.monotonic())
+            else:
+                self.failed += 1
+            self._admit_waiting()
+
+    def position(self, ticket):
+        """
+        1-based place of `ticket` in the queue.
+
+        Returns:
+        - int or None: None once the request holds a slot or has left the queue.
+        """
+        with self.lock:
+            try:
+                return self.queue.index(ticket) + 1
+            except ValueError:
+                return None
+
+    def record_rate_limit(self):
+        with self.lock:
+            self.rate_limited += 1
+
+    def stats(self):
+        """
+        Current load and recent performance of the controller.
+
+        Returns:
+        - dict: Active and queued requests, the cap, totals, median and 95th percentile
+          wait in seconds over the last 1000 admissions, and completions per minute over
+          the last `window_seconds`.
+        """
+        with self.lock:
+            now = time.monotonic()
+            while self.finishes and now - self.finishes[0] > self.window_seconds:
+                self.finishes.popleft()
+            waits = sorted(self.waits)
+            return {
+                'active': self.active,
+                'queued': len(self.queue),
+                'max_concurrent': self.max_concurrent,
+                'admitted': self.admitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rate_limited': self.rate_limited,
+                'wait_p50': statistics.median(waits) if waits else 0.0,
+                'wait_p95': waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+                'completed_per_minute': len(self.finishes) * 60 / self.window_seconds,
+            }
+
+
+def is_rate_limited(error):
+    # OpenAI's RateLimitError and the stub's failures both carry the HTTP status
+    return getattr(error, 'status_code', None) == 429
+
+
+def backoff_seconds(error, attempt, base=1.0, cap=16.0):
+    """
+    How long to wait before retrying a rate-limited request.
+
+    Args:
+    - error (Exception): The 429 error; its Retry-After header is honoured when present.
+    - attempt (int): Number of retries made so far.
+    - base (float, optional): Delay of the first retry.
+    - cap (float, optional): Longest delay.
+
+    Returns:
+    - float: Seconds, exponential in `attempt` with full jitter so queued sessions spread out.
+    """
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return min(float(retry_after), cap)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# Shared by every session of the process; configure with MAGNUS_LLM_MAX_CONCURRENT
+llm_admission = AdmissionController(max_concurrent=int(os.environ.get('MAGNUS_LLM_MAX_CONCURRENT', '8')))
+
+# Retries of a rate-limited request before it fails; configure with MAGNUS_LLM_MAX_RETRIES
+llm_max_retries = int(os.environ.get('MAGNUS_LLM_MAX_RETRIES', '3'))
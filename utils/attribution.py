@@ -0,0 +1,103 @@
+# utils/attribution.py
+# Per-asset score attribution and marginal gains, from one matrix computation over the
+# dimension and option tables. Each row's share of the portfolio times the factors of the
+# options it selects is its contribution; summing contributions over rows gives back the
+# dimension and overall scores of `calculate_wealth_score`.
+import numpy as np
+import pandas as pd
+
+from utils.scoring import encode_option_weights, option_factors, parse_amounts, scoring_config
+
+
+def asset_values(form_data):
+    """
+    Score points each row would earn if it held the whole portfolio after planning.
+
+    Split rows earn the weighted factors of both options of the split.
+
+    Args:
+    - form_data (pd.DataFrame): The form with its dimension columns.
+
+    Returns:
+    - np.ndarray: One value per row. Unmatched dimension cells contribute 0.
+    """
+    _, after_factors = option_factors()
+    option_weights = encode_option_weights(form_data)
+    entry_values = option_weights.weights * np.append(after_factors, 0.0)[option_weights.codes]
+    return np.bincount(option_weights.rows, weights=entry_values, minlength=option_weights.n_rows)
+
+
+def asset_attribution(form_data):
+    """
+    Contribution of every asset row to every dimension score and to the overall score.
+
+    Args:
+    - form_data (pd.DataFrame): The form, as passed to `calculate_wealth_score`.
+
+    Returns:
+    - dict: "Before Planning" and "After Planning" DataFrames, one row per asset and one
+      column per dimension label plus "Overall". Columns sum to the unrounded scores.
+    """
+    option_weights = encode_option_weights(form_data)
+    n_dimensions = len(scoring_config.labels)
+    labels = list(scoring_config.labels)
+    attribution = {}
+    for stage, factors in zip(("Before Planning", "After Planning"), option_factors()):
+        amounts = parse_amounts(form_data[stage])
+        total = amounts.sum()
+        shares = amounts / total if total != 0 else np.zeros(len(amounts))
+        # (rows, dimensions): the row's share times the factors of the options it puts dollars in
+        entry_values = shares[option_weights.rows] * option_weights.weights * np.append(factors, 0.0)[option_weights.codes]
+        contributions = np.bincount(
+            option_weights.rows * n_dimensions + option_weights.dimensions, weights=entry_values,
+            minlength=option_weights.n_rows * n_dimensions,
+        ).reshape(option_weights.n_rows, n_dimensions)
+        frame = pd.DataFrame(contributions, columns=labels, index=form_data["Asset Type"].to_numpy())
+        frame["Overall"] = contributions.sum(axis=1)
+        attribution[stage] = frame
+    return attribution
+
+
+def marginal_gains(form_data):
+    """
+    After Planning score gained per $1 moved from asset i (rows) to asset j (columns).
+
+    The total after planning is preserved, so the gain is the difference of the two
+    assets' values divided by the total.
+
+    Args:
+    - form_data (pd.DataFrame): The form, as passed to `calculate_wealth_score`.
+
+    Returns:
+    - pd.DataFrame: Square matrix indexed by "Asset Type" on both axes.
+    """
+    values = asset_values(form_data)
+    total = parse_amounts(form_data["After Planning"]).sum()
+    gains = (values[None, :] - values[:, None]) / total if total != 0 else np.zeros((len(values), len(values)))
+    assets = form_data["Asset Type"].to_numpy()
+    return pd.DataFrame(gains, index=assets, columns=assets)
+
+
+def top_moves(form_data, k=10):
+    """
+    The `k` moves with the largest gain per $1, from assets that hold After Planning dollars.
+
+    Returns:
+    - pd.DataFrame: "From", "To", "Gain per $1" and "Gain per $10,000" columns.
+    """
+    gains = marginal_gains(form_data)
+    holding = parse_amounts(form_data["After Planning"]) > 0
+    matrix = np.where(holding[:, None], gains.to_numpy(), -np.inf)
+    flat = matrix.ravel()
+    k = min(k, flat.size)
+    best = np.argpartition(flat, flat.size - k)[flat.size - k:] if k else np.array([], dtype=int)
+    best = best[np.argsort(-flat[best], kind="stable")]
+    rows, cols = np.unravel_index(best, matrix.shape)
+    keep = matrix[rows, cols] > 0
+    rows, cols = rows[keep], cols[keep]
+    return pd.DataFrame({
+        "From": gains.index[rows],
+        "To": gains.columns[cols],
+        "Gain per $1": matrix[rows, cols],
+        "Gain per $10,000": matrix[rows, cols] * 10_000,
+    })
@@ -0,0 +1,168 @@
+# utils/cache.py
+# Content-addressed, process-wide LRU cache for scoring results, prompts and figures.
+# Keys start with a stable hash of the typed portfolio and the scoring-config version,
+# so identical portfolios hit the same entries across reruns and across sessions.
+# Figure builders are memoized separately on their own arguments, so a figure whose
+# inputs did not change is reused even when the rest of the portfolio did.
+import functools
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.scoring import scoring_config
+
+
+def portfolio_key(form_data):
+    """
+    Stable content hash of a portfolio, tied to the current scoring tables.
+
+    Args:
+    - form_data (pd.DataFrame): The typed form from `utils.ingest.ingest_form`.
+
+    Returns:
+    - str: Hex digest; equal portfolios give equal keys in every process.
+    """
+    digest = hashlib.sha256(scoring_config.version.encode())
+    digest.update("\x1f".join(map(str, form_data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(form_data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def arguments_key(args, kwargs):
+    # Hash of a call's arguments; dicts hash by content in insertion order
+    payload = pickle.dumps((args, sorted(kwargs.items())), protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.sha256(payload).hexdigest()
+
+
+scalar_types = (int, float, bool, complex, type(None), np.generic)
+
+
+def estimate_size(value, depth=0):
+    """
+    Approximate bytes held by a cached value, used to enforce the memory cap.
+
+    Walks containers instead of serializing the value, so it stays cheap on every
+    cache miss. Lists of scalars, arrays and frames are sized without visiting
+    their elements.
+
+    Args:
+    - value: A result, prompt, frame or figure.
+    - depth (int, optional): Nesting level; containers deeper than 8 levels count only themselves.
+
+    Returns:
+    - int: Estimated bytes.
+    """
+    if isinstance(value, (str, bytes, bytearray) + scalar_types):
+        return sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(value.memory_usage(index=True, deep=False)))
+    if depth >= 8:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k, depth + 1) + estimate_size(v, depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        first = next(iter(value), None)
+        if value and isinstance(first, scalar_types):
+            # Plotly traces hold long lists of numbers; size them from the first element
+            return sys.getsizeof(value) + len(value) * sys.getsizeof(first)
+        return sys.getsizeof(value) + sum(estimate_size(item, depth + 1) for item in value)
+    if hasattr(value, "_data") and hasattr(value, "_layout"):
+        # Plotly figure: its traces and layout are plain dicts and lists
+        return estimate_size(value._data, depth + 1) + estimate_size(value._layout, depth + 1)
+    data = getattr(value, "data", None)
+    if isinstance(data, pd.DataFrame):
+        # Altair chart: the data frame dominates
+        return sys.getsizeof(value) + estimate_size(data, depth + 1)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the estimated bytes of its values.
+
+    Streamlit serves every session from threads of one process, so a module-level
+    instance is shared by all advisors.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, value, size=None):
+        size = estimate_size(value) if size is None else size
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self.entries[key] = (value, size)
+            self.bytes += size
+            # Evict least recently used entries until the cap holds again
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+        return value
+
+    def get_or_compute(self, key, compute):
+        # Concurrent misses on one key may both compute; the last put wins, which is harmless here
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+# Shared by every session of the process; size it with MAGNUS_RESULT_CACHE_MB
+result_cache = LRUCache(max_bytes=int(os.environ.get("MAGNUS_RESULT_CACHE_MB", "256")) * 1024 * 1024)
+
+
+# Figures memoized by `memoize_builder`; size it with MAGNUS_FIGURE_CACHE_MB
+figure_cache = LRUCache(max_bytes=int(os.environ.get("MAGNUS_FIGURE_CACHE_MB", "64")) * 1024 * 1024)
+
+
+def memoize_builder(builder, cache=figure_cache):
+    """
+    Memoize a figure builder on the exact arguments it is called with.
+
+    Args:
+    - builder (callable): Function whose result depends only on its arguments.
+    - cache (LRUCache, optional): Where the results are kept. Defaults to `figure_cache`.
+
+    Returns:
+    - callable: The memoized builder. Callers share the returned objects and must not mutate them.
+    """
+    name = f"{builder.__module__}.{builder.__qualname__}"
+
+    @functools.wraps(builder)
+    def memoized(*args, **kwargs):
+        return cache.get_or_compute((name, arguments_key(args, kwargs)), lambda: builder(*args, **kwargs))
+
+    return memoized
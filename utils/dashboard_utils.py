@@ -5,6 +5,7 @@ import plotly.graph_objects as go
 import matplotlib.pyplot as plt
 import plotly.express as px
 import seaborn as sns
+from utils.scoring import dimensions, option_scores, calculate_wealth_score
 
 # Disable default sidebar navigation
 st.set_option('client.showSidebarNavigation', False)
@@ -30,103 +31,6 @@ def display_login_page():
         else:
             st.error("Invalid username or password")
 
-def calculate_wealth_score(form_data):
-    # Define the dimensions and their options with weights
-    dimensions = {
-        "D1": {"label": "Taxation on Funding", "options": ["Pre-Tax", "Partially Pre-Tax", "After-Tax"], "weight": 0.20},
-        "D2": {"label": "Taxation on Growth", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Tax-Deferred", "Tax-Free"], "weight": 0.20},
-        "D3": {"label": "Taxation on Distribution", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Not taxable"], "weight": 0.20},
-        "D4": {"label": "Taxation on Death", "options": ["Yes", "No"], "weight": 0.20},
-        "D5": {"label": "Asset Protection", "options": ["Yes", "No", "Partially"], "weight": 0.10},
-        "D6": {"label": "Charitable Deduction", "options": ["Yes", "No"], "weight": 0.10}
-    }
-    
-    # Define scores for options in each dimension
-    option_scores = {
-        "D1": {"Pre-Tax": 3, "Partially Pre-Tax": 2, "After-Tax": 1},
-        "D2": {"Taxable/Capital Gain": 1, "Taxable/Ordinary Income": 2, "Tax-Deferred": 3, "Tax-Free": 4},
-        "D3": {"Taxable/Ordinary Income": 1, "Taxable/Capital Gain": 2, "Not taxable": 3},
-        "D4": {"Yes": 1, "No": 2},
-        "D5": {"Yes": 3, "Partially": 2, "No": 1},
-        "D6": {"Yes": 2, "No": 1}
-    }
-
-    # Compute total income before and after planning
-    total_income_before_planning = form_data["Before Planning"].replace('', 0).astype(float).sum()
-    total_income_after_planning = form_data["After Planning"].replace('', 0).astype(float).sum()
-
-    results = {}
-
-    # Initialize accumulators for overall scores
-    overall_total_before_score = 0
-    overall_total_after_score = 0
-
-    for dimension, props in dimensions.items():
-        dimension_label = props["label"]
-        options = props["options"]
-        weight = props["weight"]
-
-        # Initialize results for this dimension
-        results[dimension] = {
-            "Dimension Label": dimension_label,
-            "Options": {}
-        }
-
-        total_before_score = 0
-        total_after_score = 0
-
-        for option in options:
-            before_sum = form_data[form_data[f"{dimension}: {dimension_label}"] == option]["Before Planning"].replace('', 0).astype(float).sum()
-            after_sum = form_data[form_data[f"{dimension}: {dimension_label}"] == option]["After Planning"].replace('', 0).astype(float).sum()
-
-            # Get the score for this option
-            option_score = option_scores[dimension].get(option, 0)
-
-            # Calculate the percentage for the option in the dimension
-            before_percentage = before_sum / total_income_before_planning if total_income_before_planning != 0 else 0
-            after_percentage = after_sum / total_income_after_planning if total_income_after_planning != 0 else 0
-
-            # Calculate scores before and after planning
-            # Note: Special case for D6 where Before Planning Score is set to zero for all options
-            if dimension == "D6":
-                score_before_planning = 0
-            else:
-                score_before_planning = (weight * 100 * option_score / len(options)) * before_percentage
-
-            score_after_planning = (weight * 100 * option_score / len(options)) * after_percentage
-
-            # Accumulate scores for the dimension
-            total_before_score += score_before_planning
-            total_after_score += score_after_planning
-
-            # Populate the nested dictionary for each option
-            results[dimension]["Options"][option] = {
-                "Before Planning": before_sum,
-                "After Planning": after_sum,
-                "Before Planning %": before_percentage,
-                "After Planning %": after_percentage,
-                "Before Planning Score": score_before_planning,
-                "After Planning Score": score_after_planning
-            }
-
-        # Add the total scores for the dimension
-        results[dimension]["Total Before Planning Score"] = total_before_score
-        results[dimension]["Total After Planning Score"] = total_after_score
-
-        # Calculate the weighted average score for the dimension
-        overall_total_before_score += total_before_score
-        overall_total_after_score += total_after_score
-
-    # Add the overall scores to the results dictionary
-    results["Overall"] = {
-        "Overall Before Planning Score": overall_total_before_score,
-        "Overall After Planning Score": overall_total_after_score
-    }
-
-    return results
-
-
-
 
 # Data for the gauge charts
 performance_data = {
@@ -260,16 +164,6 @@ def create_pie_chart(data, title):
     return fig
 
 def display_wealth_score_results(results):
-
-    # Define scores for options in each dimension
-    option_scores = {
-        "D1": {"Pre-Tax": 3, "Partially Pre-Tax": 2, "After-Tax": 1},
-        "D2": {"Taxable/Capital Gain": 1, "Taxable/Ordinary Income": 2, "Tax-Deferred": 3, "Tax-Free": 4},
-        "D3": {"Taxable/Ordinary Income": 1, "Taxable/Capital Gain": 2, "Not taxable": 3},
-        "D4": {"Yes": 1, "No": 2},
-        "D5": {"Yes": 3, "Partially": 2, "No": 1},
-        "D6": {"Yes": 2, "No": 1}
-    }
     # Extract overall scores
     overall_before_planning_score = results.get("Overall", {}).get("Overall Before Planning Score")
     overall_after_planning_score = results.get("Overall", {}).get("Overall After Planning Score")
@@ -335,16 +229,6 @@ def main():
     if check_login():
         st.title("Wealth Planning Form")
 
-        # Define the dimensions and their options
-        dimensions = {
-            "D1": {"label": "Taxation on Funding", "options": ["Pre-Tax", "Partially Pre-Tax", "After-Tax"]},
-            "D2": {"label": "Taxation on Growth", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Tax-Deferred", "Tax-Free"]},
-            "D3": {"label": "Taxation on Distribution", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Not taxable"]},
-            "D4": {"label": "Taxation on Death", "options": ["Yes", "No"]},
-            "D5": {"label": "Asset Protection", "options": ["Yes", "No", "Partially"]},
-            "D6": {"label": "Charitable Deduction", "options": ["Yes", "No"]}
-        }
-
         # # Define the rows of the table
         # rows = [
         #     "Marketable Securities (Non-Qualified)",
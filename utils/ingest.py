@@ -0,0 +1,131 @@
+# utils/ingest.py
+# Typed ingestion of the planning form. AgGrid hands back mixed types: blank strings,
+# numbers sent as strings and percentages like "50%". This module converts the grid
+# output to one fixed schema in a single vectorized pass per column and collects the
+# cells that could not be converted, so the scorer, charts and prompt builder all read
+# the same typed frame.
+import numpy as np
+import pandas as pd
+
+from utils.scoring import parse_percentages, scoring_config
+
+amount_columns = ("Before Planning", "After Planning")
+percentage_columns = tuple(split[1] for split in scoring_config.splits)
+
+# Fixed column order of the typed frame
+form_columns = ("Asset Type", *amount_columns, *scoring_config.columns, *percentage_columns)
+
+error_columns = ["Row", "Asset Type", "Column", "Value", "Message"]
+
+
+def _is_blank(raw):
+    return raw.isna() | raw.astype(str).str.strip().eq('')
+
+
+def _errors(raw, bad, asset_types, column, message):
+    rows = np.flatnonzero(bad.to_numpy())
+    return pd.DataFrame({
+        "Row": rows,
+        "Asset Type": asset_types[rows],
+        "Column": column,
+        "Value": raw.to_numpy()[rows],
+        "Message": message,
+    })
+
+
+def parse_amount_column(raw):
+    # Blank cells are 0, anything else must be a number
+    blank = _is_blank(raw)
+    values = pd.to_numeric(raw.where(~blank, 0), errors='coerce')
+    return values.fillna(0.0).astype('float64'), values.isna() & ~blank
+
+
+def parse_percentage_column(raw):
+    # "50%", "50" and 50 all mean one half, as does 0.5 in a numeric column of fractions
+    # such as xlsx percent cells; blank cells are 0
+    fractions, invalid = parse_percentages(raw if pd.api.types.is_numeric_dtype(raw.dtype) else raw.astype(object))
+    return pd.Series(fractions, index=raw.index, dtype='float64'), pd.Series(invalid, index=raw.index)
+
+
+def parse_dimension_column(raw, options):
+    # Unknown options become missing; blank cells are missing without an error
+    blank = _is_blank(raw)
+    values = pd.Categorical(raw.where(~blank), categories=list(options))
+    invalid = pd.Series(values.codes < 0, index=raw.index) & ~blank
+    return pd.Series(values, index=raw.index), invalid
+
+
+def ingest_form(grid_data):
+    """
+    Convert grid output to the typed form schema.
+
+    Args:
+    - grid_data (pd.DataFrame or dict): The data returned by AgGrid, or any frame with the form columns.
+
+    Returns:
+    - tuple: (form, errors). `form` has float64 amounts, categorical dimension columns and
+      percentage columns as fractions between 0 and 1. `errors` lists one row per cell that
+      could not be converted; such cells are stored as 0 or missing.
+    """
+    raw = pd.DataFrame(grid_data).reset_index(drop=True)
+    asset_types = raw["Asset Type"].astype(str).to_numpy()
+    form = pd.DataFrame({"Asset Type": asset_types})
+    errors = []
+
+    for column in amount_columns:
+        form[column], invalid = parse_amount_column(raw[column])
+        errors.append(_errors(raw[column], invalid, asset_types, column, "Not a dollar amount"))
+
+    for column, options in zip(scoring_config.columns, scoring_config.options):
+        form[column], invalid = parse_dimension_column(raw[column], options)
+        errors.append(_errors(raw[column], invalid, asset_types, column, "Not one of: " + ", ".join(options)))
+
+    for column in percentage_columns:
+        if column not in raw.columns:
+            form[column] = 0.0
+            continue
+        form[column], invalid = parse_percentage_column(raw[column])
+        errors.append(_errors(raw[column], invalid, asset_types, column, "Not a percentage between 0% and 100%"))
+
+    errors = [frame for frame in errors if len(frame)]
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=error_columns)
+    return form[list(form_columns)], errors
+
+
+def ingest_cell(form, errors, row, column, value):
+    """
+    Convert one edited grid cell and write it into the typed form in place.
+
+    Args:
+    - form (pd.DataFrame): The typed form from `ingest_form`, updated in place.
+    - errors (pd.DataFrame): The current conversion errors.
+    - row (int): Position of the edited row.
+    - column (str): The edited column.
+    - value: The raw value sent by the grid.
+
+    Returns:
+    - tuple: (typed value, errors). `errors` drops any previous error of the cell and
+      gains one row if the new value could not be converted.
+    """
+    raw = pd.Series([value], dtype=object)
+    if column in amount_columns:
+        typed, invalid = parse_amount_column(raw)
+        message = "Not a dollar amount"
+    elif column in percentage_columns:
+        typed, invalid = parse_percentage_column(raw)
+        message = "Not a percentage between 0% and 100%"
+    elif column in scoring_config.columns:
+        options = scoring_config.options[scoring_config.columns.index(column)]
+        typed, invalid = parse_dimension_column(raw, options)
+        message = "Not one of: " + ", ".join(options)
+    else:
+        return value, errors
+
+    typed = typed.iloc[0]
+    form.at[row, column] = typed
+    errors = errors[(errors["Row"] != row) | (errors["Column"] != column)]
+    if invalid.iloc[0]:
+        asset_types = form["Asset Type"].to_numpy()[[row]]
+        error = _errors(raw, invalid, asset_types, column, message).assign(Row=row)
+        errors = pd.concat([frame for frame in (errors, error) if len(frame)], ignore_index=True)
+    return typed, errors.reset_index(drop=True)
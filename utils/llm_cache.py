@@ -0,0 +1,147 @@
+# utils/llm_cache.py
+# Disk-backed cache of finished agent answers. Advisors re-run the same portfolios
+# every day, and an identical prompt to the same model at the same temperature gets
+# its stored answer back instead of a new paid request. Entries expire after a TTL
+# and the least recently used ones are evicted once the file exceeds its size bound.
+#
+# Recommendations prepared ahead of time by batch_recommend.py go to a second store
+# with the same keys, kept for a whole review cycle and never evicted by live traffic.
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+schema = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def response_key(messages, model, temperature):
+    """
+    Hash of everything that determines an answer.
+
+    Args:
+    - messages (list): The chat messages sent to the model.
+    - model (str): Model name.
+    - temperature (float): Sampling temperature.
+
+    Returns:
+    - str: Hex digest.
+    """
+    payload = json.dumps({"messages": messages, "model": model, "temperature": temperature}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite store of answers keyed by `response_key`, with a TTL and a size bound.
+
+    Every call opens and closes its own connection, so one instance can be shared by the
+    script threads and the LLM event loop thread.
+    """
+
+    def __init__(self, path, ttl_seconds, max_bytes):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(schema)
+
+    @contextlib.contextmanager
+    def connect(self):
+        # The connection's own context manager only commits or rolls back; close it as well
+        with contextlib.closing(sqlite3.connect(self.path, timeout=5)) as connection, connection:
+            yield connection
+
+    def get(self, messages, model, temperature):
+        key = response_key(messages, model, temperature)
+        now = time.time()
+        with self.lock, self.connect() as connection:
+            row = connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, messages, model, temperature, response):
+        key = response_key(messages, model, temperature)
+        size = len(response.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock, self.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, bytes, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            # Evict least recently used answers until the stored text fits the bound again
+            total = connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = 0
+                for old_key, old_size in connection.execute("SELECT key, bytes FROM responses ORDER BY last_used").fetchall():
+                    if total - evicted <= self.max_bytes:
+                        break
+                    connection.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    evicted += old_size
+
+    def stats(self):
+        with self.connect() as connection:
+            entries, total, hits = connection.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(hits), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": total, "hits": hits}
+
+
+def replay_chunks(text, tokens_per_second=0.0):
+    """
+    Split a stored answer into word-sized chunks for the streaming renderer.
+
+    Args:
+    - text (str): The stored answer.
+    - tokens_per_second (float, optional): Replay speed; 0 yields everything at once.
+
+    Yields:
+    - str: The next chunk, keeping the original whitespace.
+    """
+    delay = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+    start = 0
+    while start < len(text):
+        end = text.find(" ", start + 1)
+        end = len(text) if end < 0 else end
+        yield text[start:end]
+        start = end
+        if delay:
+            time.sleep(delay)
+
+
+# Shared by every session of the process; configure with MAGNUS_LLM_CACHE_* variables
+response_cache = ResponseCache(
+    path=os.environ.get("MAGNUS_LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3")),
+    ttl_seconds=float(os.environ.get("MAGNUS_LLM_CACHE_TTL_HOURS", "168")) * 3600,
+    max_bytes=int(os.environ.get("MAGNUS_LLM_CACHE_MB", "64")) * 1024 * 1024,
+)
+
+
+# Answers precomputed by batch_recommend.py; configure with MAGNUS_RECOMMENDATION_STORE_* variables
+recommendation_store = ResponseCache(
+    path=os.environ.get("MAGNUS_RECOMMENDATION_STORE_PATH", os.path.join(".cache", "recommendations.sqlite3")),
+    ttl_seconds=float(os.environ.get("MAGNUS_RECOMMENDATION_STORE_TTL_DAYS", "120")) * 86400,
+    max_bytes=int(os.environ.get("MAGNUS_RECOMMENDATION_STORE_MB", "1024")) * 1024 * 1024,
+)
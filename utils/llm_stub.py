@@ -0,0 +1,256 @@
+# utils/llm_stub.py
+# Local stand-in for the chat completion API, for benchmarking and testing the
+# recommendation path without network access. The same configurable behaviour is
+# available in process, as a backend of `llm_agent`, and as an OpenAI-compatible HTTP
+# server that the real client can be pointed at with OPENAI_BASE_URL.
+#
+# Usage:
+#   MAGNUS_LLM_BACKEND=stub streamlit run app.py
+#   python -m utils.llm_stub serve --port 8001 --ttft-ms 400 --token-ms 15
+#   python -m utils.llm_stub bench --requests 20 --concurrency 4
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+vocabulary = (
+    "Reallocate wealth from taxable non-qualified assets into tax-deferred and tax-free vehicles "
+    "such as Roth accounts qualified plans and life insurance to raise the growth and distribution "
+    "scores while protected assets and charitable gifts lift the remaining dimensions"
+).split()
+
+
+class StubFailure(Exception):
+    # Raised by the in-process stub in place of a failed request
+    def __init__(self, status):
+        super().__init__(f"Stub backend failure (HTTP {status})")
+        self.status_code = status
+
+
+@dataclass
+class StubConfig:
+    ttft_ms: float = 300.0
+    token_ms: float = 20.0
+    tokens: int = 250
+    failure_rate: float = 0.0
+    failure_status: int = 500
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            ttft_ms=float(os.environ.get("MAGNUS_STUB_TTFT_MS", cls.ttft_ms)),
+            token_ms=float(os.environ.get("MAGNUS_STUB_TOKEN_MS", cls.token_ms)),
+            tokens=int(os.environ.get("MAGNUS_STUB_TOKENS", cls.tokens)),
+            failure_rate=float(os.environ.get("MAGNUS_STUB_FAILURE_RATE", cls.failure_rate)),
+            failure_status=int(os.environ.get("MAGNUS_STUB_FAILURE_STATUS", cls.failure_status)),
+            seed=int(os.environ.get("MAGNUS_STUB_SEED", cls.seed)),
+        )
+
+
+def stub_tokens(messages, config):
+    """
+    The answer the stub gives to `messages`, as a list of tokens.
+
+    The same messages always give the same answer, so runs are reproducible.
+    """
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).digest()
+    rng = random.Random(int.from_bytes(digest[:8], "big") ^ config.seed)
+    return [rng.choice(vocabulary) + " " for _ in range(config.tokens)]
+
+
+class StubBackend:
+    """
+    In-process backend with the configured time to first token, token delay and failure rate.
+    """
+
+    name = "stub"
+
+    def __init__(self, config=None):
+        self.config = config or StubConfig.from_env()
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+
+    def fails(self):
+        with self.lock:
+            return self.rng.random() < self.config.failure_rate
+
+    async def stream(self, messages, model, temperature):
+        await asyncio.sleep(self.config.ttft_ms / 1000)
+        if self.fails():
+            raise StubFailure(self.config.failure_status)
+        for token in stub_tokens(messages, self.config):
+            yield token
+            await asyncio.sleep(self.config.token_ms / 1000)
+
+
+def make_handler(config):
+    backend = StubBackend(config)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        # Speaks enough of POST /v1/chat/completions for the OpenAI client
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(config.ttft_ms / 1000)
+            if backend.fails():
+                payload = json.dumps({"error": {"message": "Stub failure", "type": "stub_error"}}).encode()
+                self.send_response(config.failure_status)
+                if config.failure_status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            tokens = stub_tokens(body.get("messages", []), config)
+            model = body.get("model", "stub")
+            if not body.get("stream"):
+                payload = json.dumps({
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    chunk = {
+                        "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(config.token_ms / 1000)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client cancelled the request
+                pass
+
+    return StubHandler
+
+
+def serve(config, host="127.0.0.1", port=8001):
+    """
+    Start the OpenAI-compatible stub server in a background thread.
+
+    Returns:
+    - ThreadingHTTPServer: Call `shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    threading.Thread(target=server.serve_forever, name="llm-stub-server", daemon=True).start()
+    return server
+
+
+def benchmark(requests, concurrency):
+    """
+    End-to-end latency of the recommendation path against the configured backend.
+
+    Answers are stored in a temporary response cache for the duration of the run, so the
+    shared cache is left untouched and a repeated run never replays an earlier one.
+
+    Returns:
+    - dict: Requests, failures, time to first token and total time percentiles in seconds,
+      and tokens per second over the whole run.
+    """
+    import llm_agent
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.llm_cache import ResponseCache
+
+    def one(i):
+        started = time.perf_counter()
+        stream = llm_agent.LLMStream(messages=[{"role": "user", "content": f"Benchmark request {i}"}]).start()
+        first_token = None
+        tokens = 0
+        for _ in stream:
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            tokens += 1
+        return first_token, time.perf_counter() - started, tokens, stream.completed
+
+    shared_cache = llm_agent.response_cache
+    with tempfile.TemporaryDirectory() as directory:
+        llm_agent.response_cache = ResponseCache(os.path.join(directory, "bench.sqlite3"), shared_cache.ttl_seconds, shared_cache.max_bytes)
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                runs = list(pool.map(one, range(requests)))
+            elapsed = time.perf_counter() - started
+        finally:
+            llm_agent.response_cache = shared_cache
+
+    completed = [run for run in runs if run[3]]
+    first_tokens = sorted(run[0] for run in completed)
+    totals = sorted(run[1] for run in completed)
+
+    def percentile(values, q):
+        return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+    from utils.admission import llm_admission
+
+    return {
+        "admission": llm_admission.stats(),
+        "requests": requests,
+        "failures": requests - len(completed),
+        "ttft_p50": statistics.median(first_tokens) if first_tokens else None,
+        "ttft_p95": percentile(first_tokens, 0.95),
+        "total_p50": statistics.median(totals) if totals else None,
+        "total_p95": percentile(totals, 0.95),
+        "tokens_per_second": sum(run[2] for run in completed) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the chat completion API.")
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, default=StubConfig.ttft_ms, help="Time to first token")
+    parser.add_argument("--token-ms", type=float, default=StubConfig.token_ms, help="Delay between tokens")
+    parser.add_argument("--tokens", type=int, default=StubConfig.tokens, help="Tokens per answer")
+    parser.add_argument("--failure-rate", type=float, default=StubConfig.failure_rate, help="Share of failed requests")
+    parser.add_argument("--failure-status", type=int, default=StubConfig.failure_status, help="HTTP status of a failure")
+    parser.add_argument("--seed", type=int, default=StubConfig.seed)
+    parser.add_argument("--requests", type=int, default=20, help="bench: number of requests")
+    parser.add_argument("--concurrency", type=int, default=4, help="bench: requests in flight")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(args.ttft_ms, args.token_ms, args.tokens, args.failure_rate, args.failure_status, args.seed)
+    if args.command == "serve":
+        server = serve(config, args.host, args.port)
+        print(f"Stub chat completions on http://{args.host}:{args.port}/v1", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        import llm_agent
+
+        llm_agent.set_backend(StubBackend(config))
+        print(json.dumps(benchmark(args.requests, args.concurrency), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# utils/optimizer.py
+# Deterministic reallocation of the "After Planning" column that maximizes the 4D score.
+#
+# With the total preserved, the After Planning score is linear in the dollars of each
+# asset: every dollar in row i earns value_i / total points, where value_i is the sum of
+# the after-planning factors of the options the row selects. Moving $1 from row i to
+# row j therefore gains (value_j - value_i) / total, and the best plan under box bounds
+# and a cap on dollars moved is found by pairing the cheapest donors with the richest
+# receivers. Assets that start outside their bounds are first moved inside them.
+import numpy as np
+
+from utils.attribution import asset_values
+from utils.scoring import calculate_wealth_score, parse_amounts
+
+
+def _per_row(value, form_data, default):
+    # Accept a scalar, a mapping keyed by "Asset Type" or a sequence aligned with the rows
+    if value is None:
+        return np.full(len(form_data), default, dtype=float)
+    if isinstance(value, dict):
+        return form_data["Asset Type"].map(value).fillna(default).to_numpy(dtype=float)
+    return np.broadcast_to(np.asarray(value, dtype=float), (len(form_data),)).copy()
+
+
+def _locked_rows(locked, form_data):
+    # Accept asset type names or a boolean mask aligned with the rows
+    if locked is None:
+        return np.zeros(len(form_data), dtype=bool)
+    locked = list(locked)
+    if locked and isinstance(locked[0], str):
+        return form_data["Asset Type"].isin(locked).to_numpy()
+    return np.asarray(locked, dtype=bool)
+
+
+def _check_allocation(allocation, total, lower, upper, is_locked, current, moved, max_moved):
+    # The returned plan must keep the total, the bounds, the locks and the cap on dollars moved
+    tolerance = 1e-6 * max(total, 1.0)
+    problems = []
+    if abs(allocation.sum() - total) > tolerance:
+        problems.append("total wealth changed")
+    if ((allocation < lower - tolerance) | (allocation > upper + tolerance)).any():
+        problems.append("an asset is outside its bounds")
+    if (np.abs(allocation - current)[is_locked] > tolerance).any():
+        problems.append("a locked asset changed")
+    if max_moved is not None and moved > max_moved + tolerance:
+        problems.append("more dollars moved than allowed")
+    if problems:
+        raise RuntimeError("Optimized allocation breaks its constraints: " + ", ".join(problems))
+
+
+def optimize_allocation(form_data, min_amounts=None, max_amounts=None, locked=None, max_moved=None):
+    """
+    Find the "After Planning" vector with the highest 4D score.
+
+    Total wealth after planning is preserved and every other column stays fixed. Assets
+    outside their bounds are first brought inside them, which counts against `max_moved`;
+    the remaining budget then goes to the moves with the highest gain.
+
+    Args:
+    - form_data (pd.DataFrame): The form, as passed to `calculate_wealth_score`.
+    - min_amounts, max_amounts (scalar, dict or sequence, optional): Per-asset dollar bounds,
+      keyed by "Asset Type" when given as a dict. Default to 0 and unbounded.
+    - locked (iterable, optional): Asset types, or a boolean row mask, that must not change.
+    - max_moved (float, optional): Cap on the dollars taken out of assets in total.
+
+    Returns:
+    - dict: The optimized "After Planning" array, the optimized form, the list of moves,
+      the dollars moved, and the After Planning score from `calculate_wealth_score`
+      before and after optimization. Raises ValueError when no allocation meets the
+      constraints: the bounds cannot hold the total, a locked asset is outside its
+      bounds, or meeting the bounds needs more than `max_moved` dollars.
+    """
+    current = parse_amounts(form_data["After Planning"])
+    lower = _per_row(min_amounts, form_data, 0.0)
+    upper = _per_row(max_amounts, form_data, np.inf)
+    is_locked = _locked_rows(locked, form_data)
+    asset_types = form_data["Asset Type"].to_numpy()
+    total = current.sum()
+
+    outside = is_locked & ((current < lower) | (current > upper))
+    if outside.any():
+        raise ValueError(f"Locked assets are outside their bounds: {asset_types[outside].tolist()}")
+    # Locked assets keep their amount, so only the free ones can absorb the total
+    floor = np.where(is_locked, current, lower).sum()
+    ceiling = np.where(is_locked, current, upper).sum()
+    if floor > total or ceiling < total:
+        raise ValueError(f"The bounds allow between ${floor:,.0f} and ${ceiling:,.0f} in total, not ${total:,.0f}")
+
+    excess = np.where(is_locked, 0.0, np.maximum(current - upper, 0.0))
+    shortfall = np.where(is_locked, 0.0, np.maximum(lower - current, 0.0))
+    required = max(excess.sum(), shortfall.sum())
+    budget = np.inf if max_moved is None else float(max_moved)
+    if required > budget:
+        raise ValueError(f"Meeting the bounds needs ${required:,.0f} moved, more than the ${budget:,.0f} allowed")
+
+    values = asset_values(form_data)
+    allocation = current.copy()
+    moves = []
+
+    def move(donor, receiver, amount):
+        allocation[donor] -= amount
+        allocation[receiver] += amount
+        moves.append({"From": asset_types[donor], "To": asset_types[receiver], "Amount": float(amount)})
+
+    free_rows = np.flatnonzero(~is_locked)
+    by_value = free_rows[np.argsort(values[free_rows], kind="stable")]
+
+    # Bring every asset inside its bounds: excess dollars go to assets below their minimum
+    # first, then to the best assets with room; missing dollars come from the worst assets
+    for donor in by_value:
+        for receiver in by_value[::-1]:
+            if excess[donor] <= 0:
+                break
+            amount = min(excess[donor], shortfall[receiver])
+            if amount > 0:
+                move(donor, receiver, amount)
+                excess[donor] -= amount
+                shortfall[receiver] -= amount
+    for donor in by_value:
+        for receiver in by_value[::-1]:
+            amount = min(excess[donor], upper[receiver] - allocation[receiver]) if receiver != donor else 0
+            if amount > 0:
+                move(donor, receiver, amount)
+                excess[donor] -= amount
+    for receiver in by_value[::-1]:
+        for donor in by_value:
+            amount = min(shortfall[receiver], allocation[donor] - lower[donor]) if receiver != donor else 0
+            if amount > 0:
+                move(donor, receiver, amount)
+                shortfall[receiver] -= amount
+    budget -= sum(move["Amount"] for move in moves)
+
+    # Donors from the lowest value up, receivers from the highest value down; ties keep row order
+    donors = by_value
+    receivers = free_rows[np.argsort(-values[free_rows], kind="stable")]
+
+    d = r = 0
+    while d < len(donors) and r < len(receivers) and budget > 0:
+        donor, receiver = donors[d], receivers[r]
+        if values[receiver] <= values[donor]:
+            break
+        available = allocation[donor] - lower[donor]
+        room = upper[receiver] - allocation[receiver]
+        if available <= 0:
+            d += 1
+            continue
+        if room <= 0:
+            r += 1
+            continue
+        amount = min(available, room, budget)
+        move(donor, receiver, amount)
+        budget -= amount
+
+    amount_moved = float(sum(move["Amount"] for move in moves))
+    _check_allocation(allocation, total, lower, upper, is_locked, current, amount_moved, max_moved)
+
+    optimized_form = form_data.copy()
+    optimized_form["After Planning"] = allocation
+    results_before = calculate_wealth_score(form_data)
+    results_after = calculate_wealth_score(optimized_form)
+
+    return {
+        "After Planning": allocation,
+        "Optimized Form": optimized_form,
+        "Moves": moves,
+        "Amount Moved": amount_moved,
+        "Score Before Optimization": results_before["Overall"]["Overall After Planning Score"],
+        "Score After Optimization": results_after["Overall"]["Overall After Planning Score"],
+        "Results": results_after,
+    }
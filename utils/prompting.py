@@ -0,0 +1,234 @@
+# utils/prompting.py
+# Prompt builder for the strategic recommendations. The portfolio goes in as one compact
+# table with a single header instead of a JSON record per row, zero-dollar assets and
+# derived fields the model can recompute are left out, and the prompt is kept within a
+# token budget counted with tiktoken. Kept free of Streamlit so batch jobs can use it.
+#
+# Everything that is the same for every client lives in `system_prefix`, a byte-identical
+# system message sent first in every conversation, so providers that cache prompt
+# prefixes only process the per-client part of each request.
+import functools
+import math
+import os
+
+from utils.ingest import ingest_form
+from utils.scoring import dimensions, is_typed_form, option_scores
+
+# Upper bound on prompt tokens; the smallest assets are summarized once it is reached
+prompt_token_budget = int(os.environ.get("MAGNUS_PROMPT_TOKEN_BUDGET", "2500"))
+
+amount_columns = ("Before Planning", "After Planning")
+percentage_columns = {dimension: props["split"]["percentage_column"] for dimension, props in dimensions.items() if "split" in props}
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model):
+    # None when the encoding cannot be loaded, e.g. on machines without internet access
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+
+def count_tokens(text, model="gpt-4o"):
+    """
+    Number of tokens `text` takes for `model`.
+
+    Falls back to one token per four characters when no tiktoken encoding is available.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text))
+
+
+def prompt_stats(prompt, model="gpt-4o"):
+    # Size of a request whose client part is `prompt`, the shared system prefix included
+    prefix_tokens = count_tokens(system_prefix, model)
+    return {
+        "tokens": prefix_tokens + count_tokens(prompt, model),
+        "prefix_tokens": prefix_tokens,
+        "characters": len(system_prefix) + len(prompt),
+        "exact": get_encoding(model) is not None,
+    }
+
+
+def scoring_rules():
+    """
+    The dimension weights and option scores as a few plain lines.
+
+    Returns:
+    - str: One line per dimension, "D1 Taxation on Funding (weight 20%): Pre-Tax=3, ...".
+    """
+    lines = []
+    for dimension, props in dimensions.items():
+        scores = ", ".join(f"{option}={option_scores[dimension][option]}" for option in props["options"])
+        line = f"{dimension} {props['label']} (weight {props['weight']:.0%}): {scores}"
+        if "split" in props:
+            first, second = props["split"]["into"]
+            line += f"; {props['split']['option']} splits the asset by its %{dimension} into {first} and the rest into {second}"
+        if not props.get("score_before_planning", True):
+            line += "; scored after planning only"
+        lines.append(line)
+    lines.append("Dimension score = weight x 100 x sum over options of (share of wealth x option score / number of options). Overall score = sum of dimension scores.")
+    return "\n".join(lines)
+
+
+def portfolio_rows(df):
+    # (size, line) per asset holding dollars before or after planning. Raw grid output such as
+    # "$1,000" or "50%" is typed first, the same way the scorer reads it
+    if not is_typed_form(df):
+        df, _ = ingest_form(df)
+    rows = []
+    for record in df.to_dict(orient="records"):
+        before, after = (float(record[column] or 0) for column in amount_columns)
+        if before == 0 and after == 0:
+            continue
+        cells = [str(record["Asset Type"]), f"{before:,.0f}", f"{after:,.0f}"]
+        for dimension, props in dimensions.items():
+            option = record.get(f"{dimension}: {props['label']}")
+            cell = "" if option is None or option != option else str(option)
+            if dimension in percentage_columns and cell == props["split"]["option"]:
+                cell += f" {float(record.get(percentage_columns[dimension]) or 0):.0%}"
+            cells.append(cell)
+        rows.append((max(before, after), " | ".join(cells)))
+    return rows
+
+
+def portfolio_header():
+    return " | ".join(["Asset Type", "Before $", "After $", *dimensions])
+
+
+def results_summary(results):
+    """
+    The scores in one line per dimension, without the dollar sums and derived totals.
+
+    Returns:
+    - str: Overall scores, then each dimension's score before -> after and the shares of
+      the options that hold any wealth.
+    """
+    overall = results["Overall"]
+    lines = [f"Overall: {overall['Overall Before Planning Score']:.2f} -> {overall['Overall After Planning Score']:.2f}"]
+    for dimension, data in results.items():
+        if not dimension.startswith("D"):
+            continue
+        shares = ", ".join(
+            f"{option} {values['Before Planning %']:.0%} -> {values['After Planning %']:.0%}"
+            for option, values in data["Options"].items()
+            if values["Before Planning %"] or values["After Planning %"]
+        )
+        lines.append(
+            f"{dimension} {data['Dimension Label']}: {data['Total Before Planning Score']:.2f} -> "
+            f"{data['Total After Planning Score']:.2f} (shares: {shares or 'none'})"
+        )
+    return "\n".join(lines)
+
+
+def fit_rows(rows, fixed_tokens, token_budget, model):
+    """
+    Keep the largest assets whose lines fit in the budget left after the fixed text.
+
+    Returns:
+    - tuple: (kept lines in their original order, number of omitted assets).
+    """
+    costs = [count_tokens(line + "\n", model) for _, line in rows]
+    kept = set(range(len(rows)))
+    used = fixed_tokens + sum(costs)
+    # Drop the smallest assets first until the table fits
+    for index in sorted(range(len(rows)), key=lambda i: rows[i][0]):
+        if used <= token_budget:
+            break
+        kept.discard(index)
+        used -= costs[index]
+    return [rows[i][1] for i in sorted(kept)], len(rows) - len(kept)
+
+
+def build_system_prefix():
+    return f"""You are an Asset Wealth Manager with strong financial expertise. Clients need your help in devising three strategies to improve their 4D wealth score. In the ###Data### the client provides, all columns remain fixed except for the "After Planning" column. Your task is to devise a reallocation of money in different asset types so that the wealth score is maximized. Use the ###Scoring### section below to understand how the wealth score is calculated; the current scores are in the client's ###Results### section.
+
+###Scoring###
+{scoring_rules()}
+
+Notes:
+- Write three strategies without providing numbers for reallocating wealth in different asset types that are better for increasing our wealth score.
+- Remember that we do not require number but strategic guidance on how to reallocate wealth given Asset Types with dimensions.
+- Remember, everything else in the data will remain fixed. Only the "After Planning" column can be changed.
+- Specify both the asset types from which we should reduce wealth and the asset types where we should invest.
+- Answer follow-up questions briefly, using the same data and scoring.
+"""
+
+
+# Built once per process; must not contain anything client specific
+system_prefix = build_system_prefix()
+
+
+def recommendation_messages(user_query):
+    # The first request of a conversation: the shared prefix, then the client's data
+    return [{"role": "system", "content": system_prefix}, {"role": "user", "content": user_query}]
+
+
+def follow_up_messages(user_query, recommendation, turns, question):
+    """
+    Messages for a follow-up question, extending the first request unchanged.
+
+    Args:
+    - user_query (str): The client part of the first request, from `create_user_query`.
+    - recommendation (str): The first answer of the conversation.
+    - turns (list): Earlier follow-ups as {"role", "content"} messages, oldest first.
+    - question (str): The new question.
+
+    Returns:
+    - list: The messages of `recommendation_messages(user_query)`, the first answer, the
+      earlier turns and the question. Every request starts with the previous one, so the
+      whole conversation so far is a reusable prefix and the portfolio table stays
+      available for questions about single assets.
+    """
+    return [
+        *recommendation_messages(user_query),
+        {"role": "assistant", "content": recommendation},
+        *turns,
+        {"role": "user", "content": question},
+    ]
+
+
+def create_user_query(results, df, token_budget=None, model="gpt-4o"):
+    """
+    Build the client part of the recommendation prompt; see `recommendation_messages`.
+
+    Args:
+    - results (dict): The results from `calculate_wealth_score`.
+    - df (pd.DataFrame): The form the results were computed from.
+    - token_budget (int, optional): Maximum prompt tokens. Defaults to `prompt_token_budget`.
+    - model (str, optional): Model whose tokenizer counts the tokens.
+
+    Returns:
+    - str: The prompt. When the table does not fit, the smallest assets are left out and
+      a line says how many were omitted.
+    """
+    token_budget = prompt_token_budget if token_budget is None else token_budget
+    rows = portfolio_rows(df)
+
+    def build(table_lines, omitted):
+        table = "\n".join([portfolio_header(), *table_lines])
+        if omitted:
+            table += f"\n({omitted} smaller assets omitted)"
+        return f"""###Data###
+One asset per line; assets without any dollars are not listed. Columns D1-D6 hold the option selected in each dimension.
+{table}
+
+###Results###
+{results_summary(results)}
+
+What are your three strategies?
+"""
+
+    # The system prefix is sent with every request and counts against the budget
+    token_budget -= count_tokens(system_prefix, model)
+    user_query = build([line for _, line in rows], 0)
+    if count_tokens(user_query, model) <= token_budget:
+        return user_query
+    fixed_tokens = count_tokens(build([], len(rows)), model)
+    kept, omitted = fit_rows(rows, fixed_tokens, token_budget, model)
+    return build(kept, omitted)
@@ -0,0 +1,568 @@
+# utils/scoring.py
+# Scoring core for the 4D Wealth model. Kept free of Streamlit so it can be
+# imported by the dashboard as well as by offline jobs.
+import hashlib
+import json
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Define the dimensions and their options with weights
+dimensions = {
+    # A "Partially Pre-Tax" asset with a percentage splits its dollars between Pre-Tax and After-Tax
+    "D1": {"label": "Taxation on Funding", "options": ["Pre-Tax", "Partially Pre-Tax", "After-Tax"], "weight": 0.20,
+           "split": {"option": "Partially Pre-Tax", "percentage_column": "% D1 (if partially pre-tax)", "into": ["Pre-Tax", "After-Tax"]}},
+    "D2": {"label": "Taxation on Growth", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Tax-Deferred", "Tax-Free"], "weight": 0.20},
+    "D3": {"label": "Taxation on Distribution", "options": ["Taxable/Ordinary Income", "Taxable/Capital Gain", "Not taxable"], "weight": 0.20},
+    "D4": {"label": "Taxation on Death", "options": ["Yes", "No"], "weight": 0.20},
+    # A "Partially" protected asset with a percentage splits its dollars between Yes and No
+    "D5": {"label": "Asset Protection", "options": ["Yes", "No", "Partially"], "weight": 0.10,
+           "split": {"option": "Partially", "percentage_column": "% D5 (if partially pre-tax)", "into": ["Yes", "No"]}},
+    # Before Planning scores are not counted for D6, the deduction only applies to planned gifts
+    "D6": {"label": "Charitable Deduction", "options": ["Yes", "No"], "weight": 0.10, "score_before_planning": False}
+}
+
+# Define scores for options in each dimension
+option_scores = {
+    "D1": {"Pre-Tax": 3, "Partially Pre-Tax": 2, "After-Tax": 1},
+    "D2": {"Taxable/Capital Gain": 1, "Taxable/Ordinary Income": 2, "Tax-Deferred": 3, "Tax-Free": 4},
+    "D3": {"Taxable/Ordinary Income": 1, "Taxable/Capital Gain": 2, "Not taxable": 3},
+    "D4": {"Yes": 1, "No": 2},
+    "D5": {"Yes": 3, "Partially": 2, "No": 1},
+    "D6": {"Yes": 2, "No": 1}
+    }
+
+
+class CompiledScoring:
+    """
+    The `dimensions` and `option_scores` tables compiled into dense arrays.
+
+    Options of all dimensions share one flat index, numbered dimension by dimension
+    in the order of `dimensions`; code `n_options` stands for "no matching option".
+    Built once per process and shared by every scoring path.
+    """
+
+    def __init__(self, dimensions, option_scores):
+        self.dimension_keys = tuple(dimensions)
+        self.labels = tuple(props["label"] for props in dimensions.values())
+        self.columns = tuple(f"{dimension}: {props['label']}" for dimension, props in dimensions.items())
+        self.options = tuple(tuple(props["options"]) for props in dimensions.values())
+        self.weights = np.array([props["weight"] for props in dimensions.values()])
+        self.score_before_planning = np.array([props.get("score_before_planning", True) for props in dimensions.values()])
+
+        self.option_keys = tuple((dimension, option) for dimension, props in dimensions.items() for option in props["options"])
+        self.n_options = len(self.option_keys)
+        self.option_dimension = np.array([self.dimension_keys.index(dimension) for dimension, _ in self.option_keys])
+        self.starts = np.cumsum([0] + [len(options) for options in self.options])[:-1]
+        self.option_codes = {
+            dimension: {option: int(start) + j for j, option in enumerate(options)}
+            for dimension, start, options in zip(self.dimension_keys, self.starts, self.options)
+        }
+        # (dimension position, percentage column, partial code, code of the percentage, code of the rest)
+        self.splits = tuple(
+            (i, props["split"]["percentage_column"], self.option_codes[dimension][props["split"]["option"]],
+             *(self.option_codes[dimension][option] for option in props["split"]["into"]))
+            for i, (dimension, props) in enumerate(dimensions.items()) if "split" in props
+        )
+        self.scores = np.array([option_scores[dimension].get(option, 0) for dimension, option in self.option_keys], dtype=float)
+
+        # Score of a fully allocated option, scaled by the dimension weight
+        n_choices = np.array([len(options) for options in self.options])[self.option_dimension]
+        self.after_factors = self.weights[self.option_dimension] * 100 * self.scores / n_choices
+        self.before_factors = np.where(self.score_before_planning[self.option_dimension], self.after_factors, 0.0)
+
+        # Stable fingerprint of the tables, for caches keyed on scoring results
+        payload = json.dumps([dimensions, option_scores], sort_keys=True).encode()
+        self.version = hashlib.sha256(payload).hexdigest()[:12]
+
+
+scoring_config = CompiledScoring(dimensions, option_scores)
+
+# Number of options across all dimensions, the length of the flat option index
+n_options = scoring_config.n_options
+
+
+def parse_amounts(column):
+    """
+    Parse a dollar column from the form into a float array, once.
+
+    Args:
+    - column (pd.Series): The raw column, possibly holding '' for blank cells.
+
+    Returns:
+    - np.ndarray: float64 amounts with blanks and missing values as 0.
+    """
+    if column.dtype == np.float64:
+        # Already typed by utils.ingest
+        amounts = column.to_numpy()
+    else:
+        amounts = column.replace('', 0).astype(float).to_numpy()
+    return np.where(np.isnan(amounts), 0.0, amounts)
+
+
+def encode_dimension_codes(form_data):
+    """
+    Encode every dimension column as integer codes into one flat option index.
+
+    Options are numbered dimension by dimension in the order of `dimensions`, so
+    D1 options take codes 0-2, D2 options 3-6 and so on. Cells that do not match
+    any option get the code `n_options` (one past the last option).
+
+    Args:
+    - form_data (pd.DataFrame): The form with one "<Dn>: <label>" column per dimension.
+
+    Returns:
+    - np.ndarray: int array of shape (rows, dimensions).
+    """
+    codes = np.empty((len(form_data), len(scoring_config.columns)), dtype=np.intp)
+    for i, (column, options, start) in enumerate(zip(scoring_config.columns, scoring_config.options, scoring_config.starts)):
+        values = form_data[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) and tuple(values.cat.categories) == options:
+            # Already typed by utils.ingest
+            column_codes = values.cat.codes.to_numpy()
+        else:
+            column_codes = pd.Categorical(values, categories=options).codes
+        codes[:, i] = np.where(column_codes >= 0, column_codes + start, n_options)
+    return codes
+
+
+def is_typed_form(form_data):
+    # True for frames from `utils.ingest.ingest_form`: every dimension column is categorical over its options
+    return all(
+        column in form_data.columns
+        and isinstance(form_data[column].dtype, pd.CategoricalDtype)
+        and tuple(form_data[column].cat.categories) == options
+        for column, options in zip(scoring_config.columns, scoring_config.options)
+    )
+
+
+def parse_percentages(column, typed=False):
+    """
+    Parse a percentage column into fractions between 0 and 1.
+
+    "50%", "50", 50 and 50.0 all mean one half. A numeric column whose values all lie
+    between 0 and 1, such as the percent-formatted cells of an xlsx file, already holds
+    fractions and is read as is. The whole column decides, so 1 next to 50 is still 1%.
+
+    Args:
+    - column (pd.Series): The raw or typed percentage column.
+    - typed (bool, optional): The column comes from `utils.ingest` and already holds fractions.
+
+    Returns:
+    - tuple: (fractions, invalid) where invalid cells are stored as 0 and blanks are 0 without an error.
+    """
+    if typed and column.dtype == np.float64:
+        fractions = column.fillna(0.0).to_numpy()
+        invalid = (fractions < 0) | (fractions > 1)
+        return np.where(invalid, 0.0, fractions), invalid
+    if pd.api.types.is_numeric_dtype(column.dtype):
+        # Numeric input holds percent points like the text form, unless every value is a
+        # fraction as in xlsx percent cells (50% is stored as 0.5)
+        blank = column.isna().to_numpy()
+        fractions = column.to_numpy(dtype=float)
+        if not ((fractions[~blank] >= 0) & (fractions[~blank] <= 1)).all():
+            fractions = fractions / 100
+    else:
+        blank = (column.isna() | column.astype(str).str.strip().eq('')).to_numpy()
+        text = column.astype(str).str.strip().str.rstrip('%').str.strip()
+        fractions = pd.to_numeric(text, errors='coerce').to_numpy(dtype=float) / 100
+    invalid = (np.isnan(fractions) | (fractions < 0) | (fractions > 1)) & ~blank
+    return np.where(invalid | blank, 0.0, fractions), invalid
+
+
+# Sparse (rows, options) weight matrix in coordinate form: entry k puts `weights[k]` of the
+# dollars of row `rows[k]` into option `codes[k]` of dimension `dimensions[k]`
+OptionWeights = namedtuple("OptionWeights", "rows dimensions codes weights n_rows")
+
+
+def encode_option_weights(form_data, codes=None):
+    """
+    Encode how every row spreads its dollars over the options of each dimension.
+
+    A row normally puts all its dollars in the one option it selects. Rows that select
+    the partial option of a split dimension with a non-zero percentage put that share
+    in the first option of the split and the rest in the second, so every scoring
+    path stays a single sparse product whatever the number of split rows.
+
+    Args:
+    - form_data (pd.DataFrame): The form with its dimension and percentage columns.
+    - codes (np.ndarray, optional): Output of `encode_dimension_codes`, if already computed.
+
+    Returns:
+    - OptionWeights: One entry per row and dimension plus one per split row.
+    """
+    if codes is None:
+        codes = encode_dimension_codes(form_data)
+    typed = is_typed_form(form_data)
+    n_rows, n_dimensions = codes.shape
+    rows = [np.repeat(np.arange(n_rows), n_dimensions)]
+    entry_dimensions = [np.tile(np.arange(n_dimensions), n_rows)]
+    entry_codes = [codes.ravel().copy()]
+    weights = [np.ones(n_rows * n_dimensions)]
+
+    for i, column, partial, first, second in scoring_config.splits:
+        if column not in form_data.columns:
+            continue
+        fractions, _ = parse_percentages(form_data[column], typed)
+        split_rows = np.flatnonzero((codes[:, i] == partial) & (fractions > 0))
+        if not len(split_rows):
+            continue
+        # Retarget the row's entry to the first option and add one entry for the rest
+        entries = split_rows * n_dimensions + i
+        entry_codes[0][entries] = first
+        weights[0][entries] = fractions[split_rows]
+        rows.append(split_rows)
+        entry_dimensions.append(np.full(len(split_rows), i))
+        entry_codes.append(np.full(len(split_rows), second))
+        weights.append(1 - fractions[split_rows])
+
+    return OptionWeights(
+        np.concatenate(rows), np.concatenate(entry_dimensions), np.concatenate(entry_codes), np.concatenate(weights), n_rows
+    )
+
+
+def sum_by_option(option_weights, amounts):
+    # Sparse product amounts @ W as one bincount over the weight entries
+    sums = np.bincount(
+        option_weights.codes, weights=amounts[option_weights.rows] * option_weights.weights, minlength=n_options + 1
+    )
+    return sums[:n_options]
+
+
+def option_keys():
+    # (dimension, option) pairs in flat option index order
+    return scoring_config.option_keys
+
+
+def option_factors():
+    """
+    Score points earned by an option holding the whole portfolio, in flat option order.
+
+    Returns:
+    - tuple: (before_factors, after_factors) arrays of length `n_options`.
+    """
+    return scoring_config.before_factors, scoring_config.after_factors
+
+
+def score_option_sums(before_sums, after_sums, total_before, total_after):
+    """
+    Turn option sums into percentages and scores, for one or many portfolios.
+
+    Every argument may carry leading portfolio axes; the option axis is last and
+    follows the flat option index of `encode_dimension_codes`.
+
+    Args:
+    - before_sums, after_sums (np.ndarray): Dollar sums per option, shape (..., n_options).
+    - total_before, total_after (np.ndarray): Total dollars per portfolio, shape (...).
+
+    Returns:
+    - dict: Unrounded arrays keyed like the fields of `calculate_wealth_score`.
+    """
+    total_before = np.asarray(total_before, dtype=float)[..., None]
+    total_after = np.asarray(total_after, dtype=float)[..., None]
+
+    # Calculate the percentage for every option, 0 when the portfolio is empty
+    before_percentages = np.divide(before_sums, total_before, out=np.zeros(np.shape(before_sums)), where=total_before != 0)
+    after_percentages = np.divide(after_sums, total_after, out=np.zeros(np.shape(after_sums)), where=total_after != 0)
+
+    before_factors, after_factors = option_factors()
+
+    scores_before_planning = before_factors * before_percentages
+    scores_after_planning = after_factors * after_percentages
+
+    # Sum option scores into dimension scores, then dimension scores into the overall score
+    dimension_before_scores = np.add.reduceat(scores_before_planning, scoring_config.starts, axis=-1)
+    dimension_after_scores = np.add.reduceat(scores_after_planning, scoring_config.starts, axis=-1)
+
+    return {
+        "Before Planning": before_sums,
+        "After Planning": after_sums,
+        "Before Planning %": before_percentages,
+        "After Planning %": after_percentages,
+        "Before Planning Score": scores_before_planning,
+        "After Planning Score": scores_after_planning,
+        "Total Before Planning Score": dimension_before_scores,
+        "Total After Planning Score": dimension_after_scores,
+        "Overall Before Planning Score": dimension_before_scores.sum(axis=-1),
+        "Overall After Planning Score": dimension_after_scores.sum(axis=-1),
+    }
+
+
+def calculate_wealth_score(form_data):
+    # Parse the value columns and encode the dimension columns once
+    before = parse_amounts(form_data["Before Planning"])
+    after = parse_amounts(form_data["After Planning"])
+    option_weights = encode_option_weights(form_data)
+
+    # Option sums for every dimension in a single pass, then all scores at once
+    scores = score_option_sums(
+        sum_by_option(option_weights, before),
+        sum_by_option(option_weights, after),
+        before.sum(),
+        after.sum(),
+    )
+    return build_results(scores)
+
+
+def build_results(scores):
+    # Nested results dict of one portfolio from the arrays of `score_option_sums`
+    results = {}
+    config = scoring_config
+    for i, (dimension, label, options, start, weight) in enumerate(zip(
+            config.dimension_keys, config.labels, config.options, config.starts, config.weights)):
+
+        # Populate the nested dictionary for each option
+        results[dimension] = {
+            "Dimension Label": label,
+            "Options": {
+                option: {
+                    "Before Planning": float(scores["Before Planning"][j]),
+                    "After Planning": float(scores["After Planning"][j]),
+                    "Before Planning %": float(round(scores["Before Planning %"][j], 4)),  # Format as percentage
+                    "After Planning %": float(round(scores["After Planning %"][j], 4)),   # Format as percentage
+                    "Before Planning Score": float(round(scores["Before Planning Score"][j], 2)),
+                    "After Planning Score": float(round(scores["After Planning Score"][j], 2))
+                }
+                for j, option in enumerate(options, start=start)
+            }
+        }
+
+        total_before_score = scores["Total Before Planning Score"][i]
+        total_after_score = scores["Total After Planning Score"][i]
+
+        # Add the total scores for the dimension
+        results[dimension]["Total Before Planning Score"] = float(round(total_before_score, 2))
+        results[dimension]["Total After Planning Score"] = float(round(total_after_score, 2))
+
+        # Add the total scores for the dimension
+        results[dimension]["Total Before Planning Score Percentage"] = float(round(total_before_score/weight, 4))
+        results[dimension]["Total After Planning Score Percentage"] = float(round(total_after_score/weight, 4))
+
+    # Add the overall scores to the results dictionary
+    results["Overall"] = {
+        "Overall Before Planning Score": float(round(scores["Overall Before Planning Score"], 2)),
+        "Overall After Planning Score": float(round(scores["Overall After Planning Score"], 2))
+    }
+
+    return results
+
+
+def parse_amount(value):
+    # Single-cell counterpart of `parse_amounts`
+    if value is None or value == '':
+        return 0.0
+    amount = float(value)
+    return 0.0 if np.isnan(amount) else amount
+
+
+class IncrementalScorer:
+    """
+    Running per-option sums of one portfolio, updated cell by cell.
+
+    Each update touches at most two options per dimension, so a single edit costs
+    O(1) and the scores are rebuilt from the option sums alone, without a pass
+    over the rows.
+    """
+
+    stages = ("Before Planning", "After Planning")
+
+    def __init__(self, form_data):
+        self.codes = encode_dimension_codes(form_data)
+        self.amounts = {stage: parse_amounts(form_data[stage]) for stage in self.stages}
+        option_weights = encode_option_weights(form_data, self.codes)
+        self.sums = {stage: sum_by_option(option_weights, self.amounts[stage]) for stage in self.stages}
+        self.totals = {stage: float(self.amounts[stage].sum()) for stage in self.stages}
+        # Dimension column name -> (position, dimension key)
+        self.columns = {column: (i, dimension) for i, (column, dimension) in enumerate(zip(scoring_config.columns, scoring_config.dimension_keys))}
+        # Percentage column name -> position in `scoring_config.splits`
+        self.percentage_columns = {split[1]: s for s, split in enumerate(scoring_config.splits)}
+        self.split_of_dimension = {split[0]: s for s, split in enumerate(scoring_config.splits)}
+        self.fractions = np.zeros((len(self.codes), len(scoring_config.splits)))
+        typed = is_typed_form(form_data)
+        for column, s in self.percentage_columns.items():
+            if column in form_data.columns:
+                self.fractions[:, s], _ = parse_percentages(form_data[column], typed)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _entries(self, row, i):
+        # (option code, weight) pairs the row puts its dollars in for dimension i
+        code = self.codes[row, i]
+        s = self.split_of_dimension.get(i)
+        if s is not None:
+            _, _, partial, first, second = scoring_config.splits[s]
+            fraction = self.fractions[row, s]
+            if code == partial and fraction > 0:
+                return ((first, fraction), (second, 1 - fraction))
+        return ((code, 1.0),) if code < n_options else ()
+
+    def _move(self, row, i, sign):
+        # Add (sign=1) or remove (sign=-1) the row's dollars for dimension i
+        for code, weight in self._entries(row, i):
+            for stage in self.stages:
+                self.sums[stage][code] += sign * weight * self.amounts[stage][row]
+
+    def update_amount(self, row, stage, value):
+        # Move the difference into the total and into the options of every dimension of the row
+        amount = parse_amount(value)
+        delta = amount - self.amounts[stage][row]
+        self.amounts[stage][row] = amount
+        self.totals[stage] += delta
+        for i in range(self.codes.shape[1]):
+            for code, weight in self._entries(row, i):
+                self.sums[stage][code] += weight * delta
+
+    def update_dimension(self, row, dimension, option):
+        # Move the row's dollars from its old option to the new one
+        i = scoring_config.dimension_keys.index(dimension)
+        self._move(row, i, -1)
+        self.codes[row, i] = scoring_config.option_codes[dimension].get(option, n_options)
+        self._move(row, i, 1)
+
+    def update_percentage(self, row, column, fraction):
+        # Re-split the row's dollars of the dimension the percentage column belongs to
+        s = self.percentage_columns[column]
+        i = scoring_config.splits[s][0]
+        self._move(row, i, -1)
+        self.fractions[row, s] = fraction
+        self._move(row, i, 1)
+
+    def update_cell(self, row, column, value):
+        # Dispatch one typed cell of the form to the matching update
+        if column in self.stages:
+            self.update_amount(row, column, value)
+        elif column in self.columns:
+            self.update_dimension(row, self.columns[column][1], value)
+        elif column in self.percentage_columns:
+            self.update_percentage(row, column, value)
+
+    def scores(self):
+        return score_option_sums(
+            self.sums["Before Planning"],
+            self.sums["After Planning"],
+            self.totals["Before Planning"],
+            self.totals["After Planning"],
+        )
+
+    def results(self):
+        return build_results(self.scores())
+
+
+def calculate_wealth_scores_batch(portfolios, client_column="Client ID"):
+    """
+    Score many portfolios given as one long-format table in a single pass.
+
+    Args:
+    - portfolios (pd.DataFrame): One row per asset line, with the form columns plus `client_column`.
+    - client_column (str): Column identifying the portfolio each row belongs to.
+
+    Returns:
+    - dict: Columnar arrays, see `_batch_results`. Rows follow first appearance of each client id.
+    """
+    client_codes, client_ids = pd.factorize(portfolios[client_column], sort=False)
+    if (client_codes < 0).any():
+        raise ValueError(f"Rows without a value in '{client_column}' cannot be scored")
+
+    before = parse_amounts(portfolios["Before Planning"])
+    after = parse_amounts(portfolios["After Planning"])
+    option_weights = encode_option_weights(portfolios)
+
+    # Offset every option code by its client so one bincount fills the whole (clients, options) table
+    n_clients = len(client_ids)
+    flat_codes = option_weights.codes + client_codes[option_weights.rows] * (n_options + 1)
+    size = n_clients * (n_options + 1)
+    before_sums = np.bincount(flat_codes, weights=before[option_weights.rows] * option_weights.weights, minlength=size)
+    after_sums = np.bincount(flat_codes, weights=after[option_weights.rows] * option_weights.weights, minlength=size)
+
+    return _batch_results(
+        np.asarray(client_ids),
+        before_sums.reshape(n_clients, n_options + 1)[:, :n_options],
+        after_sums.reshape(n_clients, n_options + 1)[:, :n_options],
+        np.bincount(client_codes, weights=before, minlength=n_clients),
+        np.bincount(client_codes, weights=after, minlength=n_clients),
+    )
+
+
+def calculate_wealth_scores_from_allocations(allocations, asset_form, client_ids=None):
+    """
+    Score many portfolios that share one asset list, given as a 3-D allocation array.
+
+    Args:
+    - allocations (np.ndarray): Dollars of shape (portfolios, assets, 2), Before then After Planning.
+    - asset_form (pd.DataFrame): One row per asset holding the dimension and percentage columns of the form.
+    - client_ids (sequence, optional): Labels for the portfolios, defaults to 0..portfolios-1.
+
+    Returns:
+    - dict: Columnar arrays, see `_batch_results`.
+    """
+    allocations = np.nan_to_num(np.asarray(allocations, dtype=float))
+    if allocations.ndim != 3 or allocations.shape[2] != 2 or allocations.shape[1] != len(asset_form):
+        raise ValueError(f"Expected allocations of shape (portfolios, {len(asset_form)}, 2), got {allocations.shape}")
+
+    # (assets, options) weight matrix, so option sums are one matrix product per stage
+    option_weights = encode_option_weights(asset_form)
+    membership = np.zeros((len(asset_form), n_options + 1))
+    np.add.at(membership, (option_weights.rows, option_weights.codes), option_weights.weights)
+    membership = membership[:, :n_options]
+
+    if client_ids is None:
+        client_ids = np.arange(allocations.shape[0])
+    return _batch_results(
+        np.asarray(client_ids),
+        allocations[:, :, 0] @ membership,
+        allocations[:, :, 1] @ membership,
+        allocations[:, :, 0].sum(axis=1),
+        allocations[:, :, 1].sum(axis=1),
+    )
+
+
+def _batch_results(client_ids, before_sums, after_sums, total_before, total_after):
+    # Columnar batch output: one row per portfolio, option columns in `option_keys()` order
+    # and dimension columns in `dimensions` order. Scores are left unrounded.
+    scores = score_option_sums(before_sums, after_sums, total_before, total_after)
+    return {
+        "Client ID": client_ids,
+        "Total Before Planning": total_before,
+        "Total After Planning": total_after,
+        "Overall Before Planning Score": scores["Overall Before Planning Score"],
+        "Overall After Planning Score": scores["Overall After Planning Score"],
+        "Dimension Before Planning Score": scores["Total Before Planning Score"],
+        "Dimension After Planning Score": scores["Total After Planning Score"],
+        "Option Before Planning": scores["Before Planning"],
+        "Option After Planning": scores["After Planning"],
+        "Option Before Planning %": scores["Before Planning %"],
+        "Option After Planning %": scores["After Planning %"],
+        "Option Before Planning Score": scores["Before Planning Score"],
+        "Option After Planning Score": scores["After Planning Score"],
+    }
+
+
+def batch_scores_to_frame(scores, include_options=False):
+    """
+    Flatten the columnar output of the batch scorers into a wide DataFrame.
+
+    Args:
+    - scores (dict): Output of `calculate_wealth_scores_batch` or `calculate_wealth_scores_from_allocations`.
+    - include_options (bool): Also emit one sum and one score column per option and stage.
+
+    Returns:
+    - pd.DataFrame: One row per portfolio.
+    """
+    columns = {
+        "Client ID": scores["Client ID"],
+        "Total Before Planning": scores["Total Before Planning"],
+        "Total After Planning": scores["Total After Planning"],
+        "Overall Before Planning Score": scores["Overall Before Planning Score"],
+        "Overall After Planning Score": scores["Overall After Planning Score"],
+    }
+    for stage in ("Before Planning", "After Planning"):
+        for i, dimension in enumerate(scoring_config.dimension_keys):
+            columns[f"{dimension} {stage} Score"] = scores[f"Dimension {stage} Score"][:, i]
+    if include_options:
+        for stage in ("Before Planning", "After Planning"):
+            for j, (dimension, option) in enumerate(option_keys()):
+                columns[f"{dimension} {option} {stage}"] = scores[f"Option {stage}"][:, j]
+                columns[f"{dimension} {option} {stage} Score"] = scores[f"Option {stage} Score"][:, j]
+    return pd.DataFrame(columns)